@@ -0,0 +1,254 @@
+"""Persistent backtest result cache
+
+Results are stored in SQLite under a content key of (fund data fingerprint,
+strategy identity, parameters), so a rerun only computes the fund x
+strategy pairs whose data or strategy changed. Entries are pickled; the
+least recently used ones are evicted once the cache outgrows max_bytes.
+"""
+import contextlib
+import hashlib
+import json
+import multiprocessing.util
+import os
+import pickle
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+
+from app.models.strategy import FundData
+from app.models.ledger import to_day_numbers
+from app.data.loader import FundDataView
+from app.models.stateful import source_hash
+
+DEFAULT_PATH = os.path.join('results', 'cache', 'backtests.sqlite')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Part of every key: bump when the backtest engine changes results
+# without any strategy changing
+CACHE_VERSION = 1
+
+# Caches opened by this process, by path; a forked worker opens its own
+_caches: Dict[Tuple[int, str], 'ResultCache'] = {}
+
+
+def data_fingerprint(fund_data: Sequence[FundData]) -> str:
+    """Content hash of a fund's dates, net values and change rates"""
+    if isinstance(fund_data, FundDataView):
+        series = fund_data.series
+        dates, prices, changes = series.dates, series.prices, series.changes
+    else:
+        dates = to_day_numbers([day['FSRQ'] for day in fund_data])
+        prices = np.array([day['DWJZ'] for day in fund_data], dtype=np.float64)
+        changes = np.array([day['JZZZL'] or 'nan' for day in fund_data], dtype=np.float64)
+    digest = hashlib.sha1()
+    for column in (dates, prices, changes):
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return digest.hexdigest()
+
+
+def strategy_identity(strategy: Any) -> Dict[str, Any]:
+    """Name, version and parameters identifying a strategy's results
+
+    Objects providing identity() (see app.models.stateful.Strategy) describe
+    themselves; plain functions are identified by qualified name and source.
+    """
+    if hasattr(strategy, 'identity'):
+        return strategy.identity()
+    return {'name': '{}.{}'.format(strategy.__module__, strategy.__qualname__),
+            'version': source_hash(strategy)}
+
+
+def result_key(data_hash: str, strategy: Any, **params) -> str:
+    """Cache key of one strategy's result on one fund's data"""
+    key = {'cache': CACHE_VERSION, 'data': data_hash,
+           'strategy': strategy_identity(strategy), 'params': params}
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+class ResultCache:
+    """SQLite table of pickled results by key
+
+    Safe to share between the processes of the fund runner: writes take the
+    database lock up front and hit/miss counters are kept in the database,
+    so stats() covers all processes. Reads never write: last-use times and
+    counters are batched in memory and flushed with the next put, by
+    stats(), or when the process exits. The total entry size is kept as the
+    'bytes' counter instead of being summed on every put.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                         'created REAL NOT NULL, used REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_used ON results(used)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._db.commit()
+        # Last use of the keys read, and counter deltas, not yet written
+        self._used: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        with self._transaction():
+            self._count_bytes()
+        # Run at exit of this process, forked fund runner workers included
+        multiprocessing.util.Finalize(self, self.flush, exitpriority=10)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Write transaction holding the lock from the start, so reads inside it stay current"""
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._db.rollback()
+            raise
+        self._db.commit()
+
+    def _count(self, **deltas: int) -> None:
+        self._db.executemany(
+            'INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            [(name, delta) for name, delta in deltas.items() if delta])
+
+    def _count_bytes(self) -> None:
+        """Start the 'bytes' counter from the table if it has none, e.g. after clear()"""
+        self._db.execute("INSERT OR IGNORE INTO counters SELECT 'bytes', COALESCE(SUM(size), 0) FROM results")
+
+    def _flush(self) -> None:
+        """Write the batched last-use times and counters; call inside a transaction"""
+        self._db.executemany('UPDATE results SET used = ? WHERE key = ?',
+                             [(used, key) for key, used in self._used.items()])
+        self._count(**self._counts)
+        self._used.clear()
+        self._counts.clear()
+
+    def flush(self) -> None:
+        if self._used or self._counts:
+            with self._transaction():
+                self._flush()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Cached results of the keys that are present"""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute('SELECT key, value FROM results WHERE key IN ({})'.format(
+                ','.join('?' * len(chunk))), chunk).fetchall()
+            found.update((key, pickle.loads(value)) for key, value in rows)
+        now = time.time()
+        self._used.update((key, now) for key in found)
+        self._counts['hits'] = self._counts.get('hits', 0) + len(found)
+        self._counts['misses'] = self._counts.get('misses', 0) + len(keys) - len(found)
+        return found
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        now = time.time()
+        rows = {key: (key, blob, len(blob), now, now)
+                for key, blob in ((key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in items)}
+        keys = list(rows)
+        with self._transaction():
+            replaced = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                replaced += self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results WHERE key IN ({})'.format(
+                    ','.join('?' * len(chunk))), chunk).fetchone()[0]
+            self._db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows.values())
+            self._count(bytes=sum(row[2] for row in rows.values()) - replaced)
+            self._flush()
+            self._evict(self.max_bytes)
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def get_or_compute(self, keys: Sequence[str], compute: Callable[[List[int]], List[Any]]) -> List[Any]:
+        """Results for every key, calling compute(indices) once for the missing ones
+
+        Args:
+            keys: One key per result
+            compute: Takes the indices of the missing keys and returns their
+                results in the same order
+        """
+        found = self.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            computed = compute(missing)
+            self.put_many((keys[i], result) for i, result in zip(missing, computed))
+            found.update((keys[i], result) for i, result in zip(missing, computed))
+        return [found[key] for key in keys]
+
+    def size(self) -> int:
+        row = self._db.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _evict(self, max_bytes: int) -> int:
+        excess = self.size() - max_bytes
+        if excess <= 0:
+            return 0
+        # Oldest entries whose cumulative size covers the excess
+        evicted = self._db.execute(
+            'SELECT key, size FROM (SELECT key, size, SUM(size) OVER (ORDER BY used, key) - size AS before '
+            'FROM results) WHERE before < ?', (excess,)).fetchall()
+        self._db.executemany('DELETE FROM results WHERE key = ?', [(key,) for key, _ in evicted])
+        self._count(evictions=len(evicted), bytes=-sum(size for _, size in evicted))
+        return len(evicted)
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Drop least recently used entries until the cache fits max_bytes; returns how many"""
+        with self._transaction():
+            self._flush()
+            return self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters of all processes, after flushing this one's"""
+        self.flush()
+        counters = dict(self._db.execute('SELECT name, value FROM counters'))
+        entries = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return {'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0),
+                'evictions': counters.get('evictions', 0), 'entries': entries,
+                'bytes': counters.get('bytes', 0)}
+
+    def clear(self) -> None:
+        self._used.clear()
+        self._counts.clear()
+        with self._transaction():
+            self._db.execute('DELETE FROM results')
+            self._db.execute('DELETE FROM counters')
+            self._count_bytes()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+        _caches.pop((os.getpid(), self.path), None)
+
+
+def open_cache(path: str | None = None) -> ResultCache | None:
+    """The result cache of this process, or None when disabled
+
+    The location comes from path, else the FUND_CACHE environment variable,
+    else DEFAULT_PATH; FUND_CACHE=off disables caching.
+    """
+    path = path or os.environ.get('FUND_CACHE') or DEFAULT_PATH
+    if path.lower() in ('off', '0', 'false', 'none'):
+        return None
+    key = (os.getpid(), path)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = ResultCache(path)
+    return cache
+
+
+if __name__ == "__main__":
+    import sys
+    cache = open_cache(*sys.argv[2:3])
+    if cache is None:
+        sys.exit("Result cache is disabled")
+    if sys.argv[1:2] == ['clear']:
+        cache.clear()
+    print("{}: {}".format(cache.path, cache.stats()))
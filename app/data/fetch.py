@@ -1,10 +1,18 @@
 import json
 import httpx
 import asyncio
-from typing import TypedDict, List, Callable
+import contextlib
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+from datetime import date
+from typing import TypedDict, Any, Dict, List, Tuple, Callable
 from abc import ABC, abstractmethod
 import logging
 
+from app.data.ratelimit import eastmoney_limiter
+
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -29,66 +37,339 @@ class InvestmentStrategy(ABC):
         pass
 
 
-async def fetch_fund_data(fund_code: str, page_size: int = 100) -> List[FundData]:
-    """Fetch fund historical data using async HTTP request"""
-    url = f'https://api.fund.eastmoney.com/f10/lsjz'
+LSJZ_URL = 'https://api.fund.eastmoney.com/f10/lsjz'
+LSJZ_HEADERS = {
+    'Referer': 'https://fundf10.eastmoney.com/',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
+# Rows per page served by the lsjz endpoint
+LSJZ_PAGE_SIZE = 20
+
+DEFAULT_HISTORY_ROOT = os.environ.get('FUND_HISTORY') or '/tmp/fund-history'
+DEFAULT_HISTORY_BYTES = int(os.environ.get('FUND_HISTORY_MB') or 64) * 1024 * 1024
+
+
+def eastmoney_client(concurrency: int = 8) -> httpx.AsyncClient:
+    """Keep-alive client for the eastmoney endpoints, pooling up to concurrency connections"""
+    return httpx.AsyncClient(headers=LSJZ_HEADERS,
+                             limits=httpx.Limits(max_connections=concurrency,
+                                                 max_keepalive_connections=concurrency))
+
+
+async def fetch_page(client: httpx.AsyncClient, fund_code: str, index: int,
+                     semaphore: asyncio.Semaphore) -> List[FundData]:
+    """One page of a fund's net value history, newest first, paced by eastmoney_limiter"""
     params = {
         'fundCode': fund_code,
-        'pageIndex': 1,
-        'pageSize': 20,
-    }
-    headers = {
-        'Referer': 'https://fundf10.eastmoney.com/',
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+        'pageIndex': index,
+        'pageSize': LSJZ_PAGE_SIZE,
     }
-    results = []
+    async with semaphore, eastmoney_limiter.slot():
+        logging.info(f"Fetching page {index} of fund {fund_code}")
+        response = await client.get(LSJZ_URL, params=params)
+        response.raise_for_status()
+        # Inside the slot, so throttled or garbled responses slow the limiter down
+        data = response.json()
+        if not data or not data.get('Data') or 'LSJZList' not in data['Data']:
+            raise ValueError(f"Invalid data format for fund {fund_code}")
+    return list(data['Data']['LSJZList'])
 
-    async with httpx.AsyncClient() as client:
-        for index in range(1, 2 + max(1, (page_size // 20))):
-            logging.info(f"Fetching page {index} of {page_size // 20}")
-            params['pageIndex'] = index
-            response = await client.get(url, params=params, headers=headers)
-            data = response.json()
 
-            if not data or 'Data' not in data or 'LSJZList' not in data['Data']:
-                raise ValueError(f"Invalid data format for fund {fund_code}")
-            fund_list = list(data['Data']['LSJZList'])
-            results.extend(fund_list)
+def page_count(page_size: int) -> int:
+    """Pages fetch_fund_data requests for page_size days, one spare for days published meanwhile"""
+    return 1 + max(1, page_size // LSJZ_PAGE_SIZE)
 
-    results.sort(key=lambda x: x['FSRQ'])  # sort by date
-    return results[-page_size:]
 
+async def fetch_fund_data(fund_code: str, page_size: int = 100, client: httpx.AsyncClient | None = None,
+                          concurrency: int = 8, first_page: int = 1) -> List[FundData]:
+    """Fetch fund historical data, requesting all pages concurrently
 
-class HistoryReader:
-    def __init__(self, code: str, lmt: int = 100) -> None:
-        self.code = code
-        self.lmt = lmt
+    Args:
+        fund_code: Fund to fetch
+        page_size: Number of most recent days to return
+        client: Shared client, e.g. from eastmoney_client; a new one is opened if None
+        concurrency: Maximum pages in flight
+        first_page: Skip the newer pages before this one, e.g. when they are already known
+    Returns:
+        The last page_size days, oldest first, one row per FSRQ
+    """
+    pages = page_count(page_size)
+    semaphore = asyncio.Semaphore(concurrency)
 
-    async def read(self) -> List[FundData]:
-        fpath = '/tmp/{}-{}.json'.format(self.code, self.lmt)
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(eastmoney_client(concurrency))
+        tasks = [asyncio.ensure_future(fetch_page(client, fund_code, index, semaphore))
+                 for index in range(first_page, pages + 1)]
         try:
-            with open(fpath, 'r') as f:
-                return json.load(f)
+            page_lists = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    # Pages shift when a new day is published mid-fetch, so rows can repeat
+    results: Dict[str, FundData] = {}
+    for fund_list in page_lists:
+        for day in fund_list:
+            results.setdefault(day['FSRQ'], day)
+    return sorted(results.values(), key=lambda x: x['FSRQ'])[-page_size:]
+
+
+async def fetch_fund_data_since(fund_code: str, since: str, max_pages: int,
+                                client: httpx.AsyncClient | None = None) -> List[FundData] | None:
+    """Days newer than since, fetching pages newest first until one reaches since
+
+    A daily refresh usually needs only page 1.
+
+    Args:
+        fund_code: Fund to fetch
+        since: Newest FSRQ already known
+        max_pages: Give up after this many pages
+        client: Shared client; a new one is opened if None
+    Returns:
+        The new days, oldest first, one row per FSRQ; None if max_pages did
+        not reach back to since
+    """
+    semaphore = asyncio.Semaphore(1)
+    results: Dict[str, FundData] = {}
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(eastmoney_client(1))
+        for index in range(1, max_pages + 1):
+            fund_list = await fetch_page(client, fund_code, index, semaphore)
+            for day in fund_list:
+                if day['FSRQ'] > since:
+                    results.setdefault(day['FSRQ'], day)
+            if len(fund_list) < LSJZ_PAGE_SIZE or any(day['FSRQ'] <= since for day in fund_list):
+                break
+        else:
+            return None
+    return sorted(results.values(), key=lambda x: x['FSRQ'])
+
+
+def write_json_atomic(fpath: str, data: Any) -> None:
+    """Write data to fpath through a temporary file of its own, so readers never see a partial
+    file and concurrent writers, in this process or another, never share one"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(fpath) or '.',
+                                    prefix='.{}.'.format(os.path.basename(fpath)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, fpath)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def merge_days(*histories: List[FundData]) -> List[FundData]:
+    """Union of histories by FSRQ, oldest first; earlier histories win on duplicates"""
+    days: Dict[str, FundData] = {}
+    for history in histories:
+        for day in history:
+            days.setdefault(day['FSRQ'], day)
+    return sorted(days.values(), key=lambda x: x['FSRQ'])
+
+
+class HistoryStore:
+    """One ever-growing history per fund code, serving any lmt or date range
+
+    Each fund is kept as {root}/{code}.json (root from FUND_HISTORY, else
+    /tmp/fund-history) holding the newest
+    contiguous run of days fetched so far, plus whether it reaches back to
+    the fund's first day. A read only downloads what the stored run lacks.
+    Recently read funds stay in memory, least recently used first out once
+    their estimated in-memory size exceeds max_bytes (FUND_HISTORY_MB, 64 MB
+    by default). Reads return copies of the rows, so callers cannot alter
+    the cached history.
+    """
+
+    def __init__(self, root: str = DEFAULT_HISTORY_ROOT, max_bytes: int = DEFAULT_HISTORY_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._funds: 'OrderedDict[str, Tuple[int, Dict[str, Any]]]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, code: str) -> str:
+        return os.path.join(self.root, '{}.json'.format(code))
+
+    @staticmethod
+    def _memory_size(entry: Dict[str, Any]) -> int:
+        """Bytes held by the parsed rows: the list, each dict and its values (keys are shared)"""
+        return sys.getsizeof(entry['days']) + sum(
+            sys.getsizeof(day) + sum(sys.getsizeof(value) for value in day.values())
+            for day in entry['days'])
+
+    def _remember(self, code: str, entry: Dict[str, Any]) -> None:
+        size = self._memory_size(entry)
+        if code in self._funds:
+            self._bytes -= self._funds.pop(code)[0]
+        self._funds[code] = (size, entry)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._funds) > 1:
+            self._bytes -= self._funds.popitem(last=False)[1][0]
+
+    def _load(self, code: str) -> Dict[str, Any] | None:
+        cached = self._funds.get(code)
+        if cached is not None:
+            self._funds.move_to_end(code)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        try:
+            with open(self.path(code), 'rb') as f:
+                raw = f.read()
+            entry = json.loads(raw)
         except FileNotFoundError:
-            data = await fetch_fund_data(self.code, self.lmt)
-            with open(fpath, 'w') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            return data
+            return None
+        except ValueError as e:
+            print(f"Error reading {self.path(code)}, fetching again: {str(e)}")
+            return None
+        self._remember(code, entry)
+        return entry
+
+    def _save(self, code: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        os.makedirs(self.root, exist_ok=True)
+        write_json_atomic(self.path(code), entry)
+        self._remember(code, entry)
+        return entry
+
+    async def _extend(self, code: str, entry: Dict[str, Any] | None, lmt: int,
+                      client: httpx.AsyncClient | None) -> Dict[str, Any]:
+        """Entry holding at least lmt days, or the whole history if shorter"""
+        resynced = False
+        while entry is None or not (entry['complete'] or len(entry['days']) >= lmt):
+            days = entry['days'] if entry else []
+            # Reach at least a page past the stored days, in case days published since the last
+            # sync moved part of the request onto already stored days
+            want = max(lmt, len(days) + 2 * LSJZ_PAGE_SIZE)
+            # Start at the page holding the oldest stored day, so the pages overlap
+            first_page = max(1, len(days) // LSJZ_PAGE_SIZE)
+            fetched = await fetch_fund_data(code, want, client=client, first_page=first_page)
+            if days and (not fetched or fetched[0]['FSRQ'] > days[-1]['FSRQ']):
+                # Those days pushed the stored ones onto later pages: everything
+                # fetched is newer than the stored run, with a hole in between
+                first_page = 1
+                fetched = await fetch_fund_data(code, want, client=client)
+                if fetched and fetched[0]['FSRQ'] > days[-1]['FSRQ']:
+                    # Still no overlap: drop the stored run rather than keep the hole
+                    days = []
+            # Fewer rows than the requested pages hold: the fund's first day was reached
+            expected = min(want, (page_count(want) - first_page + 1) * LSJZ_PAGE_SIZE)
+            complete = len(fetched) < expected
+            merged = merge_days(fetched, days)
+            if entry is not None and not complete and len(merged) == len(days):
+                # Nothing new: days published since the store was filled moved the stored
+                # run onto later pages than its length says. Top it up to the newest day
+                # so the pages line up again, once; a second miss means they never will
+                if resynced:
+                    return entry
+                resynced = True
+                entry = await self._sync(code, entry, client, strict=True)
+                continue
+            entry = self._save(code, {'complete': complete, 'days': merged})
+        return entry
+
+    async def _sync(self, code: str, entry: Dict[str, Any], client: httpx.AsyncClient | None,
+                    strict: bool = False) -> Dict[str, Any]:
+        """Entry topped up with the days published since its newest one; strict raises instead of
+        falling back to the stored days"""
+        days = entry['days']
+        max_pages = 1 + max(1, len(days) // LSJZ_PAGE_SIZE)
+        try:
+            new_days = await fetch_fund_data_since(code, days[-1]['FSRQ'], max_pages, client)
+            if new_days is None:
+                # Too stale to walk page by page: fetch the stored length plus the gap at once
+                gap = (date.today() - date.fromisoformat(days[-1]['FSRQ'])).days * 5 // 7
+                lmt = len(days) + gap + LSJZ_PAGE_SIZE
+                fetched = await fetch_fund_data(code, lmt, client=client)
+                if fetched and fetched[0]['FSRQ'] > days[-1]['FSRQ']:
+                    return self._save(code, {'complete': False, 'days': fetched})
+                return self._save(code, {'complete': entry['complete'] or len(fetched) < lmt,
+                                        'days': merge_days(fetched, days)})
         except Exception as e:
-            print(f"Error reading {fpath}: {str(e)}")
-            return []
+            if strict:
+                raise
+            print(f"Error syncing {code}, using cached data: {str(e)}")
+            return entry
+        if not new_days:
+            return entry
+        return self._save(code, {'complete': entry['complete'], 'days': merge_days(days, new_days)})
+
+    async def read(self, code: str, lmt: int | None = None, start: str | None = None,
+                   end: str | None = None, sync: bool = False, strict: bool = False,
+                   client: httpx.AsyncClient | None = None) -> List[FundData]:
+        """Days of one fund, oldest first, downloading only what the store lacks
+
+        Args:
+            code: Fund code
+            lmt: Return only the last lmt days (of the range, if one is given)
+            start, end: Inclusive FSRQ range, e.g. '2024-01-01'
+            sync: Top up the stored history with newly published days first
+            strict: Raise when the sync fails instead of serving the stored days
+            client: Shared client for any requests
+        """
+        entry = self._load(code)
+        if entry is not None and entry['days'] and sync:
+            entry = await self._sync(code, entry, client, strict)
+        entry = await self._extend(code, entry, lmt or LSJZ_PAGE_SIZE, client)
+
+        # Reach back to start, about five trading days per calendar week
+        while start is not None and not entry['complete'] and entry['days'][0]['FSRQ'] > start:
+            oldest = entry['days'][0]['FSRQ']
+            missing = (date.fromisoformat(oldest) - date.fromisoformat(start)).days * 5 // 7
+            entry = await self._extend(code, entry, len(entry['days']) + missing + LSJZ_PAGE_SIZE, client)
+
+        days = entry['days']
+        if start is not None or end is not None:
+            days = [day for day in days if (start is None or day['FSRQ'] >= start)
+                    and (end is None or day['FSRQ'] <= end)]
+        return [dict(day) for day in (days[-lmt:] if lmt else days)]
+
+    def clear(self) -> None:
+        """Forget the in-memory layer; stored files are kept"""
+        self._funds.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'funds': len(self._funds), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# Process-wide store behind HistoryReader and read_history
+history_store = HistoryStore()
+
+
+class HistoryReader:
+    def __init__(self, code: str, lmt: int = 100, sync: bool = False) -> None:
+        """
+        Args:
+            code: Fund code
+            lmt: Number of most recent days to read
+            sync: Top up the stored history with the days published since its newest FSRQ
+        """
+        self.code = code
+        self.lmt = lmt
+        self.sync = sync
+
+    async def read(self, client: httpx.AsyncClient | None = None) -> List[FundData]:
+        return await history_store.read(self.code, self.lmt, sync=self.sync, client=client)
 
 
-async def read_history(code: str, lmt: int = 100) -> List[FundData]:
-    reader = HistoryReader(code, lmt)
+async def read_history(code: str, lmt: int = 100, sync: bool = False) -> List[FundData]:
+    reader = HistoryReader(code, lmt, sync)
     return await reader.read()
 
 
-async def fetch_fund_data_with_retry(fund_code: str, max_retries: int = 3) -> List[FundData]:
-    """Fetch fund data with retry mechanism if data seems incomplete"""
+async def fetch_fund_data_with_retry(fund_code: str, max_retries: int = 3,
+                                     client: httpx.AsyncClient | None = None) -> List[FundData]:
+    """Last 240 days of a fund from the history store, retrying if data seems incomplete"""
     for attempt in range(max_retries):
         try:
-            data = await fetch_fund_data(fund_code, page_size=240)
+            data = await history_store.read(fund_code, 240, sync=True, client=client)
             if not data or len(data) <= 20:  # Check for empty data
                 print(
                     f"Attempt {attempt + 1}: Incomplete data for fund {fund_code}, retrying...")
@@ -112,21 +393,23 @@ async def save_fund_data_to_csv(fund_codes: List[str], output_dir: str = "data")
 
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
-    async def process_fund(fund_code: str):
+    async def process_fund(fund_code: str, client: httpx.AsyncClient):
         try:
-            data = await fetch_fund_data_with_retry(fund_code)
+            data = await fetch_fund_data_with_retry(fund_code, client=client)
             df = pd.DataFrame(data)
             output_path = os.path.join(output_dir, f"{fund_code}.csv")
             df.to_csv(output_path, index=False)
-            print(f"Successfully saved data for fund {fund_code}")
+            stats = eastmoney_limiter.stats()
+            print(f"Successfully saved data for fund {fund_code} "
+                  f"({stats['requests_per_sec']:.1f} req/s, {stats['queue_depth']} queued)")
         except Exception as e:
             print(f"Failed to process fund {fund_code}: {str(e)}")
 
-    chunk_size = 5
-    for i in range(0, len(fund_codes), chunk_size):
-        chunk = fund_codes[i:i + chunk_size]
-        await asyncio.gather(*(process_fund(code) for code in chunk))
-        await asyncio.sleep(1)
+    # Every fund at once over one connection pool; eastmoney_limiter keeps
+    # the requests flowing at the rate the endpoint currently sustains
+    async with eastmoney_client(eastmoney_limiter.max_in_flight) as client:
+        await asyncio.gather(*(process_fund(code, client) for code in fund_codes))
+    print("Requests: {requests}, errors: {errors}, final rate {rate:.1f} req/s".format(**eastmoney_limiter.stats()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+from typing import Sequence
+import numpy as np
+import pandas as pd
+
+from app.models.strategy import FundData
+from app.models.ledger import to_day_numbers, to_date_strings
+
+# The only columns the backtests read, with their types
+CSV_COLUMNS = {'FSRQ': str, 'DWJZ': np.float64, 'JZZZL': np.float64}
+
+
+class FundSeries:
+    """Typed columns of one fund CSV
+
+    dates are day numbers (see to_day_numbers), prices the DWJZ net values
+    and changes the JZZZL change rates in percent, NaN where missing.
+    """
+
+    def __init__(self, dates: np.ndarray, prices: np.ndarray, changes: np.ndarray) -> None:
+        self.dates = np.ascontiguousarray(dates, dtype=np.int64)
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self.changes = np.ascontiguousarray(changes, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def date_strings(self) -> np.ndarray:
+        return to_date_strings(self.dates)
+
+    def records(self) -> 'FundDataView':
+        return FundDataView(self)
+
+
+class FundDataView(Sequence):
+    """List[FundData] look-alike over a FundSeries
+
+    Rows are built on access with the same string values the old
+    iterrows() loader produced, so per-day code keeps working while array
+    code reads view.series directly.
+    """
+
+    def __init__(self, series: FundSeries) -> None:
+        self.series = series
+        self._columns = None
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self._columns is None:
+            # Python lists on first row access only, array users never pay for them
+            self._columns = (self.series.date_strings.tolist(), self.series.prices.tolist(),
+                             self.series.changes.tolist())
+        dates, prices, changes = self._columns
+        return {
+            'FSRQ': dates[index],
+            'DWJZ': str(prices[index]),
+            'JZZZL': str(changes[index])
+        }
+
+
+def load_fund_series(file_path: str, engine: str | None = None) -> FundSeries:
+    """Load the columns of a fund CSV written by save_fund_data_to_csv
+
+    Args:
+        file_path: CSV file of one fund
+        engine: pandas parser, e.g. 'pyarrow' when installed; default 'c'
+    """
+    df = pd.read_csv(file_path, usecols=list(CSV_COLUMNS), dtype=CSV_COLUMNS,
+                     engine=engine or 'c')
+    return FundSeries(to_day_numbers(df['FSRQ'].to_numpy()), df['DWJZ'].to_numpy(),
+                      df['JZZZL'].to_numpy())
+
+
+def read_fund_csv(file_path: str) -> FundDataView:
+    """Load fund data from a CSV file as FundData rows backed by a FundSeries"""
+    return load_fund_series(file_path).records()
+
+
+def fund_prices(fund_data: Sequence[FundData]) -> np.ndarray:
+    """DWJZ of every day as float64, without parsing rows when fund_data is a FundDataView"""
+    if isinstance(fund_data, FundDataView):
+        return fund_data.series.prices
+    return np.array([day['DWJZ'] for day in fund_data], dtype=np.float64)
+
@@ -0,0 +1,186 @@
+"""Aligned dates x funds panel of all fund CSVs, stored as .npy files and opened with mmap
+
+Layout of a store directory (data/panel by default):
+- dates.npy: int64 day numbers of the shared date axis
+- prices.npy, changes.npy: float64 DWJZ and JZZZL, dates x funds, NaN where a
+  fund has no row; column-major so every fund's history is contiguous
+- index.json: fund codes in column order, with the row span and the CSV
+  size/mtime each column was built from
+"""
+import contextlib
+import json
+import os
+import tempfile
+from typing import BinaryIO, Callable, Dict, List, Tuple
+import numpy as np
+
+from app.data.loader import FundSeries, FundDataView, load_fund_series, read_fund_csv
+from app.models.ledger import to_date_strings
+
+PANEL_DIR = 'panel'
+INDEX_VERSION = 1
+
+# Opened stores of this process by directory
+_stores: Dict[str, 'PanelStore'] = {}
+
+
+def _stamp(file_path: str) -> List[int]:
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _fund_files(fund_dir: str) -> Dict[str, str]:
+    return {file_name.split('.')[0]: os.path.join(fund_dir, file_name)
+            for file_name in os.listdir(fund_dir) if file_name.endswith('.csv')}
+
+
+def _write_unique(path: str, write: Callable[[BinaryIO], object]) -> None:
+    """Write path through a temporary file of its own, so concurrent builds never share one"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                               prefix='.{}.'.format(os.path.basename(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+
+def _published_shape(store_dir: str) -> Tuple[int, int] | None:
+    """(dates, funds) of the arrays in store_dir, or None when they disagree"""
+    dates, prices, changes = (np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode='r')
+                              for name in ('dates', 'prices', 'changes'))
+    if dates.ndim != 1 or prices.shape != changes.shape or prices.shape[:1] != dates.shape:
+        return None
+    return prices.shape
+
+
+class PanelStore:
+    """Read side of a panel store; arrays are read-only memory maps"""
+
+    def __init__(self, store_dir: str, mmap_mode: str | None = 'r') -> None:
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'index.json'), encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.dates = np.load(os.path.join(store_dir, 'dates.npy'), mmap_mode=mmap_mode)
+        self.prices = np.load(os.path.join(store_dir, 'prices.npy'), mmap_mode=mmap_mode)
+        self.changes = np.load(os.path.join(store_dir, 'changes.npy'), mmap_mode=mmap_mode)
+        self.funds = {fund['code']: (column, fund) for column, fund in enumerate(self.index['funds'])}
+
+    @property
+    def codes(self) -> List[str]:
+        return [fund['code'] for fund in self.index['funds']]
+
+    @property
+    def date_strings(self) -> List[str]:
+        return to_date_strings(self.dates).tolist()
+
+    def is_fresh(self, fund_code: str, file_path: str) -> bool:
+        """Whether the fund's column was built from the current version of file_path"""
+        entry = self.funds.get(fund_code)
+        return (entry is not None and entry[1]['layout'] != 'csv'
+                and os.path.exists(file_path) and _stamp(file_path) == entry[1]['stamp'])
+
+    def series(self, fund_code: str) -> FundSeries:
+        """History of one fund; a view into the maps unless the fund has date gaps"""
+        column, fund = self.funds[fund_code]
+        rows = slice(fund['start'], fund['stop'])
+        dates, prices, changes = self.dates[rows], self.prices[rows, column], self.changes[rows, column]
+        if fund['layout'] == 'gaps':
+            known = ~np.isnan(prices)
+            dates, prices, changes = dates[known], prices[known], changes[known]
+        return FundSeries(dates, prices, changes)
+
+
+def build_panel(fund_dir: str = 'data', store_dir: str | None = None) -> PanelStore | None:
+    """Consolidate every fund CSV in fund_dir into a panel store
+
+    Funds whose CSV cannot be served from the panel exactly (duplicate
+    dates or missing net values) are indexed with layout 'csv' and keep
+    being read from their file. Returns the published store, None if a
+    concurrent build left the store without a consistent index.
+    """
+    store_dir = store_dir or os.path.join(fund_dir, PANEL_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    files = _fund_files(fund_dir)
+    stamps = {code: _stamp(path) for code, path in files.items()}
+    series = {code: load_fund_series(path) for code, path in files.items()}
+
+    days = np.unique(np.concatenate([s.dates for s in series.values()] or [np.empty(0, np.int64)]))
+    prices = np.full((len(days), len(series)), np.nan, order='F')
+    changes = np.full((len(days), len(series)), np.nan, order='F')
+
+    funds = []
+    for column, (code, s) in enumerate(series.items()):
+        rows = np.searchsorted(days, s.dates)
+        prices[rows, column] = s.prices
+        changes[rows, column] = s.changes
+        start, stop = (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+        if np.isnan(s.prices).any() or (len(rows) > 1 and np.any(np.diff(rows) <= 0)):
+            layout = 'csv'
+        elif stop - start == len(rows):
+            layout = 'contiguous'
+        else:
+            layout = 'gaps'
+        funds.append({'code': code, 'file': os.path.basename(files[code]), 'stamp': stamps[code],
+                      'start': start, 'stop': stop, 'layout': layout})
+
+    # Arrays first, index last, and only over arrays of the shape it describes:
+    # a concurrent build may have replaced them since, and publishes its own index
+    for name, array in (('dates', days), ('prices', prices), ('changes', changes)):
+        _write_unique(os.path.join(store_dir, f'{name}.npy'), lambda f, array=array: np.save(f, array))
+    if _published_shape(store_dir) == (len(days), len(funds)):
+        index = {'version': INDEX_VERSION, 'funds': funds}
+        _write_unique(os.path.join(store_dir, 'index.json'),
+                      lambda f: f.write(json.dumps(index).encode('utf-8')))
+
+    _stores.pop(store_dir, None)
+    return open_panel(fund_dir, store_dir, build=False)
+
+
+def open_panel(fund_dir: str = 'data', store_dir: str | None = None,
+               build: bool = True) -> PanelStore | None:
+    """The panel store of fund_dir, opened once per process
+
+    Args:
+        fund_dir: Directory with one CSV per fund
+        store_dir: Store location, fund_dir/panel by default
+        build: Build or rebuild the store when it is missing or any CSV
+            was added, removed or changed; otherwise return it as is, or
+            None when there is none
+    """
+    store_dir = store_dir or os.path.join(fund_dir, PANEL_DIR)
+    store = _stores.get(store_dir)
+    if store is None and os.path.exists(os.path.join(store_dir, 'index.json')):
+        store = PanelStore(store_dir)
+        if store.index.get('version') != INDEX_VERSION or store.prices.shape != (
+                len(store.dates), len(store.funds)):
+            store = None
+    if build:
+        files = _fund_files(fund_dir)
+        stale = store is None or set(files) != set(store.funds) or any(
+            _stamp(path) != store.funds[code][1]['stamp'] for code, path in files.items())
+        if stale:
+            return build_panel(fund_dir, store_dir)
+    if store is not None:
+        _stores[store_dir] = store
+    return store
+
+
+def read_fund(fund_code: str, file_path: str) -> FundDataView:
+    """FundData rows of one fund from the panel store when it is up to date, else from its CSV"""
+    store = open_panel(os.path.dirname(file_path) or '.', build=False)
+    if store is not None and store.is_fresh(fund_code, file_path):
+        return store.series(fund_code).records()
+    return read_fund_csv(file_path)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    start = time.time()
+    store = build_panel(*sys.argv[1:2])
+    print("Built {} funds x {} dates in {:.2f}s: {}".format(
+        len(store.codes), len(store.dates), time.time() - start, store.store_dir))
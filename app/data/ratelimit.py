@@ -0,0 +1,127 @@
+"""Adaptive request rate limiting
+
+A token bucket spaces requests out at `rate` per second while at most
+max_in_flight are outstanding. The rate adapts AIMD style: every fast,
+successful response adds `increase` requests/sec, while an error or a
+response slower than slow_after halves it, at most once per cooldown so a
+burst of failures from one overloaded moment counts once.
+"""
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import AsyncIterator, Dict
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.5, max_rate: float = 50.0,
+                 burst: float = 5.0, max_in_flight: int = 16, increase: float = 0.2,
+                 decrease: float = 0.5, slow_after: float = 2.0, cooldown: float = 1.0) -> None:
+        """
+        Args:
+            rate: Initial requests per second
+            min_rate, max_rate: Bounds of the adapted rate
+            burst: Tokens the bucket holds, i.e. requests allowed at once after a pause
+            max_in_flight: Requests outstanding at any time
+            increase: Requests/sec added per fast success
+            decrease: Factor applied to the rate on an error or slow response
+            slow_after: Response time in seconds that counts as congestion
+            cooldown: Seconds between two decreases
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_after = slow_after
+        self.cooldown = cooldown
+
+        self.tokens = burst
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self._refilled = time.monotonic()
+        self._decreased = 0.0
+        self._completed: deque = deque()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    async def _wait(self) -> None:
+        """Take a token and an in-flight slot, sleeping until both are free"""
+        self.waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1 and self.in_flight < self.max_in_flight:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                # Poll no faster than tokens arrive; plain sleeps keep the
+                # limiter usable from any event loop
+                await asyncio.sleep(max(1 - self.tokens, 0.1) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def _record(self, ok: bool | None, elapsed: float) -> None:
+        """Release a slot and adapt the rate to its outcome; None (cancelled) only releases"""
+        now = time.monotonic()
+        self.in_flight -= 1
+        if ok is None:
+            return
+        self.requests += 1
+        self._completed.append(now)
+        if ok and elapsed <= self.slow_after:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            return
+        if not ok:
+            self.errors += 1
+        if now - self._decreased >= self.cooldown:
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._decreased = now
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for a request slot; an exception raised inside counts as an error
+
+        Cancellation is not an error: it says nothing about the endpoint, and
+        fetch_fund_data cancels a failed page's siblings.
+
+        Usage:
+            async with limiter.slot():
+                response = await client.get(url)
+                response.raise_for_status()
+        """
+        await self._wait()
+        started = time.monotonic()
+        ok: bool | None = False
+        try:
+            yield
+            ok = True
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self._record(ok, time.monotonic() - started)
+
+    def requests_per_sec(self, window: float = 10.0) -> float:
+        """Completed requests per second over the last window seconds"""
+        now = time.monotonic()
+        while self._completed and self._completed[0] < now - window:
+            self._completed.popleft()
+        return len(self._completed) / window
+
+    def stats(self) -> Dict[str, float]:
+        return {'rate': self.rate, 'requests_per_sec': self.requests_per_sec(),
+                'in_flight': self.in_flight, 'queue_depth': self.waiting,
+                'requests': self.requests, 'errors': self.errors}
+
+
+# Shared by every eastmoney fetcher in this process
+eastmoney_limiter = RateLimiter()
@@ -0,0 +1,124 @@
+"""Resumable bulk sync of a fund universe into the history store
+
+Progress is recorded per code in a manifest next to the stored histories,
+rewritten atomically after every code, so an interrupted sync picks up
+where it stopped: codes synced within max_age are skipped, and the rest
+run failed and never synced first, then least recently synced.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from app.data.fetch import eastmoney_client, history_store, write_json_atomic
+from app.data.ratelimit import eastmoney_limiter
+
+
+def unique_codes(codes: Iterable[str]) -> List[str]:
+    """Codes without duplicates, in first-seen order"""
+    return list(dict.fromkeys(codes))
+
+
+class SyncManifest:
+    """Per-code sync status: 'ok' or 'failed', when, the newest FSRQ and day count, or the error"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.codes: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            self.codes = {}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        write_json_atomic(self.path, self.codes)
+
+    def is_fresh(self, code: str, max_age: float) -> bool:
+        entry = self.codes.get(code)
+        return entry is not None and entry['status'] == 'ok' and time.time() - entry['synced'] < max_age
+
+    def stale_first(self, codes: List[str]) -> List[str]:
+        """Failed and never synced codes, then the least recently synced"""
+        def staleness(code: str):
+            entry = self.codes.get(code)
+            if entry is None:
+                return (0, 0.0)
+            return (0 if entry['status'] == 'failed' else 1, entry.get('synced', 0.0))
+        return sorted(codes, key=staleness)
+
+    def record(self, code: str, **status: Any) -> None:
+        attempts = self.codes.get(code, {}).get('attempts', 0) + 1
+        self.codes[code] = {**status, 'synced': time.time(), 'attempts': attempts}
+        self.save()
+
+
+async def sync_universe(codes: Iterable[str], lmt: int = 240, max_age_hours: float = 12.0,
+                        concurrency: int = 16, manifest_path: str | None = None) -> Dict[str, Dict[str, Any]]:
+    """Bring the stored history of every code up to date, resuming from the manifest
+
+    Args:
+        codes: Fund universe, duplicates allowed
+        lmt: Days each fund should hold at least
+        max_age_hours: Codes synced successfully more recently than this are skipped
+        concurrency: Codes syncing at once; the requests themselves are paced by eastmoney_limiter
+        manifest_path: Progress manifest, {history root}/manifest.json by default
+    Returns:
+        Manifest entry of every code, with 'status' 'skipped' for the fresh ones
+    """
+    codes = unique_codes(codes)
+    manifest = SyncManifest(manifest_path or os.path.join(history_store.root, 'manifest.json'))
+    max_age = max_age_hours * 3600
+    todo = manifest.stale_first([code for code in codes if not manifest.is_fresh(code, max_age)])
+    print(f"{len(codes)} codes, {len(codes) - len(todo)} fresh, syncing {len(todo)}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.time()
+    done = 0
+
+    async def sync_code(code: str, client) -> None:
+        nonlocal done
+        async with semaphore:
+            try:
+                data = await history_store.read(code, lmt, sync=True, strict=True, client=client)
+                if not data:
+                    raise ValueError("No history returned")
+                manifest.record(code, status='ok', newest=data[-1]['FSRQ'], days=len(data))
+                status = "ok, newest {}".format(data[-1]['FSRQ'])
+            except Exception as e:
+                manifest.record(code, status='failed', error='{}: {}'.format(type(e).__name__, e))
+                status = "FAILED: {}".format(e)
+        done += 1
+        stats = eastmoney_limiter.stats()
+        print("[{}/{}] {} {} ({:.1f}s, {:.1f} req/s, {} queued)".format(
+            done, len(todo), code, status, time.time() - started,
+            stats['requests_per_sec'], stats['queue_depth']))
+
+    async with eastmoney_client(eastmoney_limiter.max_in_flight) as client:
+        await asyncio.gather(*(sync_code(code, client) for code in todo))
+
+    synced = set(todo)
+    return {code: manifest.codes[code] if code in synced else {**manifest.codes[code], 'status': 'skipped'}
+            for code in codes}
+
+
+def generate_sync_report(results: Dict[str, Dict[str, Any]], output_path: str):
+    """Markdown table of every code's sync status, failures first"""
+    order = {'failed': 0, 'ok': 1, 'skipped': 2}
+    counts = {status: sum(1 for r in results.values() if r['status'] == status) for status in order}
+    lines = [
+        "# Universe Sync\n",
+        ", ".join(f"{count} {status}" for status, count in counts.items()) + "\n",
+        "| Code | Status | Newest | Days | Synced | Attempts | Error |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for code, r in sorted(results.items(), key=lambda item: order[item[1]['status']]):
+        lines.append("| {} | {} | {} | {} | {} | {} | {} |".format(
+            code, r['status'], r.get('newest', '-'), r.get('days', '-'),
+            datetime.fromtimestamp(r['synced']).strftime('%Y-%m-%d %H:%M'),
+            r.get('attempts', '-'), r.get('error', '').replace('|', '/')))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
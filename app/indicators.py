@@ -0,0 +1,418 @@
+"""Technical indicators shared by strategies and traders
+
+Every indicator comes in two forms:
+- a streaming class whose update() costs O(1) per new value
+- a batch function computing the whole series from a NumPy array
+
+Conventions: values are NaN until enough history is available, and RSI is
+100 when the window has no losses. Batch functions work along the last
+axis, so a paths x days array gives one series per path.
+"""
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+import math
+import numpy as np
+
+
+# ---------------------------------------------------------------- batch ---
+
+def window_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of every `window`-long slice of values (len(values) - window + 1 results)
+
+    Accumulates all slices side by side with the same compensated (Neumaier)
+    summation as Python's sum(), so threshold comparisons agree with the
+    per-day code, ties included.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    count = values.shape[-1] - window + 1
+    if count <= 0:
+        return np.empty(values.shape[:-1] + (0,))
+    total = np.zeros(values.shape[:-1] + (count,))
+    compensation = np.zeros(values.shape[:-1] + (count,))
+    for k in range(window):
+        x = values[..., k:k + count]
+        t = total + x
+        compensation += np.where(np.abs(total) >= np.abs(x), (total - t) + x, (x - t) + total)
+        total = t
+    return total + compensation
+
+
+def smooth(values: np.ndarray, decay: float, initial: float) -> np.ndarray:
+    """First-order recursive filter y[t] = decay * y[t-1] + (1 - decay) * values[t]
+
+    `initial` is y[-1], one per series. Solved in closed form over blocks short enough that
+    decay ** -block stays small, so long series need len / block NumPy passes
+    instead of a Python loop per value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(values.shape)
+    if decay <= 0:
+        out[:] = values
+        return out
+
+    n = values.shape[-1]
+    block = max(1, int(math.log(16) / -math.log(decay))) if decay < 1 else n or 1
+    powers = decay ** np.arange(1, block + 1)
+    prev = np.asarray(initial, dtype=np.float64)[..., None]
+    for start in range(0, n, block):
+        x = values[..., start:start + block]
+        end = start + x.shape[-1]
+        p = powers[:x.shape[-1]]
+        out[..., start:end] = p * (prev + (1 - decay) * np.cumsum(x / p, axis=-1))
+        prev = out[..., end - 1:end]
+    return out
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average of the `window` values ending at each index"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        out[..., window - 1:] = window_sum(values, window) / window
+    return out
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (span + 1), seeded with the first value"""
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[-1]:
+        return np.empty(values.shape)
+    alpha = 2 / (span + 1)
+    return smooth(values, 1 - alpha, values[..., 0])
+
+
+def _rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(avg_loss > 0, 100 - 100 / (1 + avg_gain / avg_loss), 100.0)
+
+
+def rsi(prices: np.ndarray, period: int = 14, method: str = 'simple') -> np.ndarray:
+    """RSI of the `period` price changes ending at each index
+
+    Args:
+        prices: Price series
+        period: Number of changes in the window
+        method: 'simple' averages the last `period` changes,
+            'wilder' seeds with the simple average and then smooths
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    out = np.full(prices.shape, np.nan)
+    if prices.shape[-1] <= period:
+        return out
+
+    changes = np.diff(prices, axis=-1)
+    gains = np.where(changes > 0, changes, 0.0)
+    losses = np.where(changes < 0, -changes, 0.0)
+
+    if method == 'simple':
+        avg_gain = window_sum(gains, period) / period
+        avg_loss = window_sum(losses, period) / period
+    elif method == 'wilder':
+        first_gain = window_sum(gains[..., :period], period) / period
+        first_loss = window_sum(losses[..., :period], period) / period
+        decay = (period - 1) / period
+        avg_gain = np.concatenate(
+            (first_gain, smooth(gains[..., period:], decay, first_gain[..., 0])), axis=-1)
+        avg_loss = np.concatenate(
+            (first_loss, smooth(losses[..., period:], decay, first_loss[..., 0])), axis=-1)
+    else:
+        raise ValueError(f"Unknown RSI method: {method}")
+
+    out[..., period:] = _rsi_from_averages(avg_gain, avg_loss)
+    return out
+
+
+def momentum(prices: np.ndarray, days: int) -> np.ndarray:
+    """Return from the price `days - 1` steps back to each index"""
+    prices = np.asarray(prices, dtype=np.float64)
+    out = np.full(prices.shape, np.nan)
+    lag = days - 1
+    if lag <= 0:
+        out[:] = 0.0
+    elif prices.shape[-1] > lag:
+        out[..., lag:] = (prices[..., lag:] - prices[..., :-lag]) / prices[..., :-lag]
+    return out
+
+
+def rolling_range(opens: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                  window: int = 12, decay: float = 0.94) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted average of daily (open - low) / open and (high - open) / open
+
+    Weights decay ** i are assigned from the oldest (i = 0) to the newest day
+    of each window, as EnhancedGridTrader does. Returns (down, up), NaN until
+    `window` days are available.
+    """
+    opens = np.asarray(opens, dtype=np.float64)
+    down = (opens - np.asarray(lows, dtype=np.float64)) / opens
+    up = (np.asarray(highs, dtype=np.float64) - opens) / opens
+    weights = decay ** np.arange(window)
+    weights = weights / weights.sum()
+
+    out_down = np.full(len(opens), np.nan)
+    out_up = np.full(len(opens), np.nan)
+    if len(opens) >= window:
+        # np.convolve flips the kernel, so reverse it to keep oldest -> weights[0]
+        out_down[window - 1:] = np.convolve(down, weights[::-1], mode='valid')
+        out_up[window - 1:] = np.convolve(up, weights[::-1], mode='valid')
+    return out_down, out_up
+
+
+def rsi_at(prices: Sequence[float], index: int, period: int = 14) -> float:
+    """RSI of the `period` changes ending at prices[index], NaN before `period`
+
+    Form for the per-day strategy functions, which are called with the full
+    price history and a date index. O(1) per day looked up in order when
+    prices is a PriceHistory; any other sequence is streamed from its start.
+    """
+    if index < period:
+        return math.nan
+    if isinstance(prices, PriceHistory):
+        return prices.stream(('rsi', period), lambda: RSI(period)).at(index)
+    indicator = RSI(period)
+    for price in prices[:index + 1]:
+        value = indicator.update(price)
+    return value
+
+
+def sma_at(prices: Sequence[float], index: int, window: int) -> float:
+    """Average of the `window` prices ending at prices[index], NaN before that many
+
+    O(1) per day looked up in order when prices is a PriceHistory, else O(window).
+    """
+    if index < window - 1:
+        return math.nan
+    if isinstance(prices, PriceHistory):
+        return prices.stream(('sma', window), lambda: SMA(window)).at(index)
+    return sum(prices[index - window + 1:index + 1]) / window
+
+
+class HistoryStream:
+    """A streaming indicator fed a PriceHistory day by day, keeping every value"""
+
+    def __init__(self, prices: 'PriceHistory', indicator) -> None:
+        self.prices = prices
+        self.indicator = indicator
+        self.values: List[float] = []
+
+    def at(self, index: int) -> float:
+        values = self.values
+        for price in self.prices[len(values):index + 1]:
+            values.append(self.indicator.update(price))
+        return values[index]
+
+
+class PriceHistory(Sequence[float]):
+    """Append-only price history owning the indicator streams of sma_at and rsi_at
+
+    Days can only be added, never changed, so the streams of a history stay
+    valid for as long as it lives, and go with it.
+    """
+
+    def __init__(self, prices: Iterable[float] = ()) -> None:
+        self._prices: List[float] = list(prices)
+        self._streams: Dict[tuple, HistoryStream] = {}
+
+    def append(self, price: float) -> None:
+        self._prices.append(price)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def __getitem__(self, index):
+        return self._prices[index]
+
+    def stream(self, key: tuple, factory: Callable[[], Any]) -> HistoryStream:
+        """Stream of indicator factory() over this history, one per key"""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = HistoryStream(self, factory())
+        return stream
+
+
+# ------------------------------------------------------------ streaming ---
+
+class RollingSum:
+    """Sum of the last `window` values, O(1) per update
+
+    The running total is rebuilt with sum() once per window to stop rounding
+    drift, and is exactly 0 whenever every value in the window is 0.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self.total = 0.0
+        self._nonzero = 0
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.total -= old
+            self._nonzero -= old != 0
+        self.values.append(value)
+        self.total += value
+        self._nonzero += value != 0
+
+        self._updates += 1
+        if self._nonzero == 0:
+            self.total = 0.0
+        elif self._updates % self.window == 0:
+            self.total = sum(self.values)
+        return self.total
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+
+class SMA:
+    """Simple moving average of the last `window` values"""
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self._sum = RollingSum(window)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        total = self._sum.update(value)
+        self.value = total / self.window if self._sum.full else math.nan
+        return self.value
+
+    def exact(self) -> float:
+        """The average recomputed with sum(), for settling near-ties with code that uses sum()"""
+        return sum(self._sum.values) / self.window if self._sum.full else math.nan
+
+    @property
+    def ready(self) -> bool:
+        return self._sum.full
+
+
+class EMA:
+    """Exponential moving average with alpha = 2 / (span + 1)"""
+
+    def __init__(self, span: int) -> None:
+        self.alpha = 2 / (span + 1)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        if math.isnan(self.value):
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return not math.isnan(self.value)
+
+
+class RSI:
+    """Streaming RSI, see rsi() for the two methods"""
+
+    def __init__(self, period: int = 14, method: str = 'simple') -> None:
+        if method not in ('simple', 'wilder'):
+            raise ValueError(f"Unknown RSI method: {method}")
+        self.period = period
+        self.method = method
+        self._gains = RollingSum(period)
+        self._losses = RollingSum(period)
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._changes = 0
+        self._prev_price: float | None = None
+        self.value = math.nan
+
+    def update(self, price: float) -> float:
+        prev, self._prev_price = self._prev_price, price
+        if prev is None:
+            return self.value
+
+        change = price - prev
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self._changes += 1
+
+        if self.method == 'wilder' and self._changes > self.period:
+            self._avg_gain = (self._avg_gain * (self.period - 1) + gain) / self.period
+            self._avg_loss = (self._avg_loss * (self.period - 1) + loss) / self.period
+        else:
+            self._avg_gain = self._gains.update(gain) / self.period
+            self._avg_loss = self._losses.update(loss) / self.period
+            if self._changes < self.period:
+                return self.value
+
+        if self._avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - (100 / (1 + self._avg_gain / self._avg_loss))
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return not math.isnan(self.value)
+
+
+class Momentum:
+    """Return from the price `days - 1` updates back to the latest price"""
+
+    def __init__(self, days: int) -> None:
+        self.days = days
+        self.prices: deque = deque(maxlen=max(days, 1))
+        self.value = math.nan
+
+    def update(self, price: float) -> float:
+        self.prices.append(price)
+        if len(self.prices) == self.days:
+            start = self.prices[0]
+            self.value = (price - start) / start
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return not math.isnan(self.value)
+
+
+class RollingRange:
+    """Streaming version of rolling_range() fed with one (open, high, low) bar at a time"""
+
+    def __init__(self, window: int = 12, decay: float = 0.94) -> None:
+        self.window = window
+        self.decay = decay
+        self.norm = sum(decay ** i for i in range(window))
+        self._down: deque = deque(maxlen=window)
+        self._up: deque = deque(maxlen=window)
+        self._weighted_down = 0.0
+        self._weighted_up = 0.0
+        self._updates = 0
+
+    def _push(self, values: deque, weighted: float, value: float) -> float:
+        # Existing values move one step older, i.e. their weight is divided by decay
+        if len(values) == self.window:
+            weighted = (weighted - values[0]) / self.decay + value * self.decay ** (self.window - 1)
+        else:
+            weighted += value * self.decay ** len(values)
+        values.append(value)
+        return weighted
+
+    def update(self, open_price: float, high: float, low: float) -> Tuple[float, float]:
+        self._weighted_down = self._push(self._down, self._weighted_down, (open_price - low) / open_price)
+        self._weighted_up = self._push(self._up, self._weighted_up, (high - open_price) / open_price)
+
+        # Dividing by decay amplifies rounding, so rebuild once per window
+        self._updates += 1
+        if self._updates % self.window == 0:
+            self._weighted_down = sum(v * self.decay ** i for i, v in enumerate(self._down))
+            self._weighted_up = sum(v * self.decay ** i for i, v in enumerate(self._up))
+        return self.value
+
+    @property
+    def value(self) -> Tuple[float, float]:
+        """(avg_down_range, avg_up_range), NaN until the window is full"""
+        if not self.ready:
+            return math.nan, math.nan
+        return self._weighted_down / self.norm, self._weighted_up / self.norm
+
+    @property
+    def ready(self) -> bool:
+        return len(self._down) == self.window
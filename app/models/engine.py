@@ -0,0 +1,483 @@
+from typing import List, Callable, Dict, Sequence
+import numpy as np
+
+from app.models.features import FundFeatures
+from app.models.ledger import Ledger, INVESTMENT_COLUMNS, to_day_numbers
+from app.data.loader import FundDataView, fund_prices
+from app.models.strategy import (FundData, Investment, fixed_drop_strategy, dynamic_drop_strategy,
+                                 periodic_strategy, ma_5_strategy, value_averaging_strategy,
+                                 rsi_strategy, enhanced_rsi_strategy)
+
+
+def _previous(values: np.ndarray) -> np.ndarray:
+    """Previous day's value for every day, NaN on the first day"""
+    prev = np.empty_like(values)
+    prev[..., :1] = np.nan
+    prev[..., 1:] = values[..., :-1]
+    return prev
+
+
+def fixed_drop_amounts(features: FundFeatures) -> np.ndarray:
+    """Vectorized fixed_drop_strategy"""
+    prices = features.prices
+    prev = _previous(prices)
+    return np.where((prev > 0) & (prices < prev), 1000.0, 0.0)
+
+
+def dynamic_drop_amounts(features: FundFeatures) -> np.ndarray:
+    """Vectorized dynamic_drop_strategy"""
+    prices = features.prices
+    prev = _previous(prices)
+    with np.errstate(invalid='ignore'):
+        drop_percent = (prev - prices) / prev * 100
+        investment = np.minimum(
+            1000 * (1 + np.power(np.where(drop_percent > 0, drop_percent, 0.0) / 2, 1.5)), 3000.0)
+    return np.where(drop_percent > 0, investment, 0.0)
+
+
+def periodic_amounts(features: FundFeatures) -> np.ndarray:
+    """Vectorized periodic_strategy"""
+    return np.broadcast_to(
+        np.where(np.arange(features.prices.shape[-1]) % 5 == 0, 1000.0, 0.0), features.prices.shape)
+
+
+def ma_5_amounts(features: FundFeatures, ma_short: int = 5) -> np.ndarray:
+    """Vectorized ma_5_strategy"""
+    # The strategy compares against the average of the days before today
+    short_ma = _previous(features.sma(ma_short))
+    return np.where(features.prices <= short_ma, 1000.0, 0.0)
+
+
+def value_averaging_amounts(features: FundFeatures, target_monthly_growth: float = 1000.0) -> np.ndarray:
+    """Vectorized value_averaging_strategy"""
+    prices = features.prices
+    index = np.arange(prices.shape[-1])
+    needed = target_monthly_growth * (index // 20 + 1) - prices
+    return np.where(index % 20 == 0, np.maximum(needed, 0.0), 0.0)
+
+
+def rsi_amounts(features: FundFeatures, period: int = 14) -> np.ndarray:
+    """Vectorized rsi_strategy"""
+    rsi = features.rsi(period)
+    return np.select([rsi < 30, rsi < 40], [1000.0, 500.0], 0.0)
+
+
+# RSI cut points and amounts of enhanced_rsi_strategy, most oversold first
+ENHANCED_RSI_TIERS = ((15.0, 20.0, 25.0, 30.0), (8000.0, 4000.0, 2000.0, 1000.0))
+
+
+def tier_amounts(rsi: np.ndarray, cuts: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Amount of the first RSI tier each day falls in, 0 above the last cut
+
+    As in enhanced_rsi_strategy the first tier is RSI < cuts[0] and tier k
+    is RSI <= cuts[k]. cuts and amounts may hold many candidate tier sets
+    (candidates x tiers), giving candidates x rsi.shape amounts.
+    """
+    rsi = np.asarray(rsi, dtype=np.float64)
+    cuts = np.asarray(cuts, dtype=np.float64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    shape = cuts.shape[:-1] + (1,) * rsi.ndim
+    out = np.zeros(cuts.shape[:-1] + rsi.shape)
+    # Later tiers first, so the first matching tier is written last
+    for k in reversed(range(cuts.shape[-1])):
+        cut = cuts[..., k].reshape(shape)
+        hit = rsi < cut if k == 0 else rsi <= cut
+        out = np.where(hit, amounts[..., k].reshape(shape), out)
+    return out
+
+
+def enhanced_rsi_amounts(features: FundFeatures, period: int = 14) -> np.ndarray:
+    """Vectorized enhanced_rsi_strategy"""
+    return tier_amounts(features.rsi(period), *ENHANCED_RSI_TIERS)
+
+
+# Per-day strategy function -> whole-series equivalent
+VECTORIZED_STRATEGIES: Dict[Callable, Callable[[FundFeatures], np.ndarray]] = {
+    fixed_drop_strategy: fixed_drop_amounts,
+    dynamic_drop_strategy: dynamic_drop_amounts,
+    periodic_strategy: periodic_amounts,
+    ma_5_strategy: ma_5_amounts,
+    value_averaging_strategy: value_averaging_amounts,
+    rsi_strategy: rsi_amounts,
+    enhanced_rsi_strategy: enhanced_rsi_amounts,
+}
+
+
+def strategy_amounts(strategy, features: FundFeatures) -> np.ndarray:
+    """Daily amounts of a strategy over the whole series
+
+    Args:
+        strategy: Object with a batch() method (see app.models.stateful), a
+            per-day function in VECTORIZED_STRATEGIES, or a function mapping
+            FundFeatures to daily amounts
+        features: Cached indicators of the fund
+    """
+    if hasattr(strategy, 'batch'):
+        return strategy.batch(features)
+    return VECTORIZED_STRATEGIES.get(strategy, strategy)(features)
+
+
+def panel_strategy_amounts(prices: np.ndarray, strategy, chunk: int = 16) -> np.ndarray:
+    """Daily amounts of one strategy for every fund of a NaN padded funds x days panel
+
+    Each fund's signals are computed on its own days, as if its series had
+    been loaded alone. Funds without date gaps are shifted to start at
+    column 0 and run through the strategy as one 2-D batch when it has a
+    vectorized form; the others are computed one by one.
+
+    Args:
+        prices: funds x days net values, NaN where a fund has no data
+        strategy: See strategy_amounts
+        chunk: Funds per batch
+    Returns:
+        funds x days amounts, 0 where a fund has no data
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    amounts = np.zeros(prices.shape)
+    known = ~np.isnan(prices)
+    lengths = known.sum(axis=1)
+    first = np.argmax(known, axis=1)
+    last = prices.shape[1] - 1 - np.argmax(known[:, ::-1], axis=1)
+    contiguous = (lengths > 0) & (last - first + 1 == lengths)
+    if VECTORIZED_STRATEGIES.get(getattr(strategy, 'func', strategy)) is None:
+        contiguous[:] = False
+
+    # Batches of similar length keep both padding and temporaries small
+    by_length = np.flatnonzero(contiguous)[np.argsort(lengths[contiguous], kind='stable')]
+    for start in range(0, len(by_length), chunk):
+        rows = by_length[start:start + chunk]
+        # Clipping to the last day pads shorter funds with their final price;
+        # signals only look back, so the padding never changes real days
+        offsets = np.arange(lengths[rows].max())
+        columns = np.minimum(first[rows, None] + offsets, last[rows, None])
+        aligned = strategy_amounts(strategy, FundFeatures(prices[rows[:, None], columns]))
+        valid = offsets < lengths[rows, None]
+        amounts[np.broadcast_to(rows[:, None], columns.shape)[valid], columns[valid]] = aligned[valid]
+
+    for row in np.flatnonzero(~contiguous & (lengths > 0)):
+        amounts[row, known[row]] = strategy_amounts(strategy, FundFeatures(prices[row, known[row]]))
+    return amounts
+
+
+def stop_loss_segments(prices: np.ndarray, units: np.ndarray, cost: np.ndarray,
+                       thresholds: np.ndarray, chunk: int = 256) -> Dict[str, np.ndarray]:
+    """Stop-loss kernel behind run_investments and sweep_stop_loss
+
+    Args:
+        prices: rows x days net values (NaN where a row has no data), or one
+            row shared by all rows
+        units: rows x days units bought, 0 on days without a buy
+        cost: rows x days amount invested
+        thresholds: Stop-loss threshold of every row
+        chunk: Days scanned per row in the first search step
+    Returns:
+        'total_units' and 'total_cost' of the final open position, the
+        accumulated stop-loss 'loss' per row, and a rows x days 'liquidated'
+        mask of the days a position was cleared
+
+    Rows are independent segments of buys separated by liquidations. Every
+    pass extends each running row from its scan position with a cumulative
+    sum carried over from the previous pass, and looks for the first breach
+    in that window; a row without a breach gallops, doubling its window, and
+    a row with one closes the segment and restarts after the liquidation
+    day. Sums are accumulated in day order like calculate_investment, so
+    breaches land on the same days.
+    """
+    units = np.atleast_2d(np.asarray(units, dtype=np.float64))
+    cost = np.atleast_2d(np.asarray(cost, dtype=np.float64))
+    n_rows, n_days = units.shape
+    prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), (n_rows, n_days))
+    thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (n_rows,))
+
+    # Price of the next day, NaN after the last day, so no check runs past the end
+    next_prices = np.full((n_rows, n_days + 1), np.nan)
+    next_prices[:, :-1] = prices
+    next_prices = next_prices[:, 1:]
+
+    pos = np.zeros(n_rows, dtype=np.int64)
+    width = np.full(n_rows, max(1, min(chunk, n_days)), dtype=np.int64)
+    carry_units = np.zeros(n_rows)
+    carry_cost = np.zeros(n_rows)
+    loss = np.zeros(n_rows)
+    liquidated = np.zeros((n_rows, n_days), dtype=bool)
+
+    running = np.flatnonzero(pos < n_days) if n_days else np.empty(0, dtype=np.int64)
+    while running.size:
+        # One row galloping far ahead should not widen every other row's window
+        width[running] = np.minimum(width[running], 2 * int(np.median(width[running])))
+        steps = np.arange(int(width[running].max()))
+        days = pos[running, None] + steps
+        inside = (days < n_days) & (steps < width[running, None])
+        days = np.minimum(days, n_days - 1)
+
+        # Day order cumulative sums, continuing from the carried position
+        day_units = np.where(inside, units[running[:, None], days], 0.0)
+        day_cost = np.where(inside, cost[running[:, None], days], 0.0)
+        day_units[:, 0] += carry_units[running]
+        day_cost[:, 0] += carry_cost[running]
+        cum_units = np.cumsum(day_units, axis=1)
+        cum_cost = np.cumsum(day_cost, axis=1)
+
+        # The check on day t + 1 uses the position held after day t
+        lost = cum_cost - cum_units * next_prices[running[:, None], days]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            breach = inside & (cum_cost > 0) & (lost / cum_cost > thresholds[running, None])
+        hit = breach.any(axis=1)
+
+        # No breach: carry the position and gallop to a wider window
+        rows = running[~hit]
+        last = width[rows] - 1
+        in_range = np.minimum(last, n_days - 1 - pos[rows])
+        carry_units[rows] = cum_units[~hit, in_range]
+        carry_cost[rows] = cum_cost[~hit, in_range]
+        pos[rows] += width[rows]
+        width[rows] = np.minimum(width[rows] * 2, n_days)
+
+        # Breach: liquidate on the next day and start an empty segment after it
+        rows = running[hit]
+        offset = np.argmax(breach[hit], axis=1)
+        loss[rows] += lost[hit, offset]
+        liquidation = pos[rows] + offset + 1
+        liquidated[rows, liquidation] = True
+        carry_units[rows] = 0.0
+        carry_cost[rows] = 0.0
+        pos[rows] = liquidation + 1
+        width[rows] = np.maximum(width[rows] // 2, 1)
+
+        running = running[pos[running] < n_days]
+
+    return {
+        'total_units': carry_units,
+        'total_cost': carry_cost,
+        'loss': loss,
+        'liquidated': liquidated,
+    }
+
+
+def run_investments(prices: np.ndarray, dates: Sequence[str], amounts: np.ndarray,
+                    stop_loss_threshold: float = 0.08) -> List[Investment]:
+    """Array version of calculate_investment for several strategies at once
+
+    Args:
+        prices: Net value for every day
+        dates: Date for every day, used for the transaction ledgers
+        amounts: strategies x days matrix of the amount each strategy wants to invest
+        stop_loss_threshold: Liquidate position when loss exceeds this percentage
+
+    A stop-loss liquidation ends a strategy's current segment: the day it
+    happens buys nothing and the strategy starts again from an empty
+    position on the next day. See stop_loss_segments.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=np.float64))
+    n_strategies, n_days = amounts.shape
+    investments = [Investment() for _ in range(n_strategies)]
+    if n_days == 0:
+        return investments
+
+    bought = amounts > 0
+    units = np.where(bought, amounts / prices, 0.0)
+    cost = np.where(bought, amounts, 0.0)
+    result = stop_loss_segments(prices, units, cost, stop_loss_threshold)
+    bought &= ~result['liquidated']  # Liquidation day buys nothing
+
+    days = to_day_numbers(dates)
+    for row, inv in enumerate(investments):
+        buy_days = np.flatnonzero(bought[row])
+        inv.transactions = Ledger.from_arrays(INVESTMENT_COLUMNS, days[buy_days],
+                                              units=units[row, buy_days],
+                                              amount=amounts[row, buy_days])
+        inv.total_units = float(result['total_units'][row])
+        inv.loss = float(result['loss'][row])
+        inv.total_cost = float(result['total_cost'][row]) + inv.loss
+    return investments
+
+
+def run_investment(prices: np.ndarray, dates: Sequence[str], amounts: np.ndarray,
+                   stop_loss_threshold: float = 0.08) -> Investment:
+    """Single-strategy run_investments"""
+    return run_investments(prices, dates, np.asarray(amounts)[None, :], stop_loss_threshold)[0]
+
+
+def calculate_investment_vectorized(data: List[FundData], strategy_func: Callable,
+                                    stop_loss_threshold: float = 0.08,
+                                    features: FundFeatures | None = None) -> Investment:
+    """Drop-in replacement for calculate_investment using whole-series strategies
+
+    Args:
+        data: List of fund data points
+        strategy_func: A Strategy, one of the per-day strategies in
+            VECTORIZED_STRATEGIES, or a function mapping FundFeatures to daily
+            investment amounts
+        stop_loss_threshold: Liquidate position when loss exceeds this percentage
+        features: Cached indicators of this fund, e.g. from feature_cache
+    """
+    return calculate_investments(data, [strategy_func], stop_loss_threshold, features)[0]
+
+
+def calculate_investments(data: List[FundData], strategy_funcs: Sequence[Callable],
+                          stop_loss_threshold: float = 0.08,
+                          features: FundFeatures | None = None) -> List[Investment]:
+    """Run several strategies over one fund together, see calculate_investment_vectorized
+
+    Returns one Investment per strategy, in the order given.
+    """
+    if features is None:
+        features = FundFeatures(fund_prices(data))
+    dates = data.series.dates if isinstance(data, FundDataView) else [day['FSRQ'] for day in data]
+    amounts = np.array([strategy_amounts(func, features) for func in strategy_funcs])
+    return run_investments(features.prices, dates, amounts.reshape(len(strategy_funcs), len(dates)),
+                           stop_loss_threshold)
+
+
+def sweep_stop_loss(prices: np.ndarray, amounts: np.ndarray,
+                    thresholds: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Backtest every amount row under every stop-loss threshold in one kernel call
+
+    Args:
+        prices: Net values shaped like amounts or broadcastable to it, e.g.
+            one series for a strategies x days matrix, or funds x 1 x days
+            (NaN padded) for a funds x strategies x days stack
+        amounts: ... x days amounts to invest, as produced by the
+            VECTORIZED_STRATEGIES functions
+        thresholds: Stop-loss thresholds to compare
+    Returns:
+        Arrays shaped amounts.shape[:-1] + (len(thresholds),):
+        'total_units', 'total_cost' (including losses, as in Investment),
+        'loss', 'liquidations', 'final_value' at the last known price and
+        'profit_rate' in percent
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), amounts.shape)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    shape = amounts.shape[:-1] + (len(thresholds),)
+    n_days = amounts.shape[-1]
+
+    prices = prices.reshape(-1, n_days)
+    amounts = amounts.reshape(-1, n_days)
+    bought = amounts > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = np.where(bought, amounts / prices, 0.0)
+    cost = np.where(bought, amounts, 0.0)
+
+    # Threshold is the fastest-varying row index
+    n_thresholds = len(thresholds)
+    result = stop_loss_segments(np.repeat(prices, n_thresholds, axis=0),
+                                np.repeat(units, n_thresholds, axis=0),
+                                np.repeat(cost, n_thresholds, axis=0),
+                                np.tile(thresholds, len(amounts)))
+
+    # Last known price of every row, NaN padding skipped
+    known = ~np.isnan(prices)
+    last = n_days - 1 - np.argmax(known[:, ::-1], axis=1)
+    final_prices = np.repeat(prices[np.arange(len(prices)), last], n_thresholds)
+
+    total_units = result['total_units']
+    loss = result['loss']
+    total_cost = result['total_cost'] + loss
+    final_value = final_prices * total_units
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_rate = np.where(total_cost > 0, (final_value - total_cost) / total_cost * 100, 0.0)
+
+    return {
+        'total_units': total_units.reshape(shape),
+        'total_cost': total_cost.reshape(shape),
+        'loss': loss.reshape(shape),
+        'liquidations': result['liquidated'].sum(axis=1).reshape(shape),
+        'final_value': final_value.reshape(shape),
+        'profit_rate': profit_rate.reshape(shape),
+    }
+
+
+def walk_forward_returns(prices: np.ndarray, amounts: np.ndarray,
+                         holding_days: Sequence[int]) -> np.ndarray:
+    """Return of every amount row for every start date and holding length
+
+    Signals come from the full price history, so a start date only decides
+    which buys are counted. Without a stop-loss a run from day s to day e
+    holds exactly the units bought in between, so cost and units are
+    differences of two prefix sums and every (start, length) pair costs O(1).
+
+    Args:
+        prices: Net value for every day, broadcastable to amounts
+        amounts: ... x days amounts to invest
+        holding_days: Holding lengths in trading days, the start day included
+    Returns:
+        ... x len(holding_days) x days profit rates in percent, indexed by
+        start day; NaN where the holding period runs past the data or
+        nothing was invested
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), amounts.shape)
+    n_days = amounts.shape[-1]
+    bought = amounts > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = np.where(bought, amounts / prices, 0.0)
+    cost = np.where(bought, amounts, 0.0)
+
+    pad = [(0, 0)] * (amounts.ndim - 1) + [(1, 0)]
+    cum_units = np.pad(np.cumsum(units, axis=-1), pad)
+    cum_cost = np.pad(np.cumsum(cost, axis=-1), pad)
+
+    returns = np.full(amounts.shape[:-1] + (len(holding_days), n_days), np.nan)
+    for i, days in enumerate(holding_days):
+        starts = n_days - days + 1
+        if days <= 0 or starts <= 0:
+            continue
+        period_cost = cum_cost[..., days:] - cum_cost[..., :starts]
+        value = (cum_units[..., days:] - cum_units[..., :starts]) * prices[..., days - 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[..., i, :starts] = np.where(
+                period_cost > 0, (value - period_cost) / period_cost * 100, np.nan)
+    return returns
+
+
+def trailing_returns(prices: np.ndarray, amounts: np.ndarray,
+                     lookbacks: Sequence[int]) -> np.ndarray:
+    """Return of every amount row over its last N known days, for several N at once
+
+    As in walk_forward_returns, signals come from the full history and a
+    window only decides which buys count, without a stop-loss: cost and
+    units of a window are differences of prefix sums shared by all
+    lookbacks. Days are counted on each row's own data, so NaN padding and
+    date gaps are skipped.
+
+    Args:
+        prices: Net values broadcastable to amounts, NaN where a row has no data
+        amounts: ... x days amounts to invest
+        lookbacks: Window lengths in known days, the last day included
+    Returns:
+        ... x len(lookbacks) profit rates in percent at the last known
+        price; NaN where a row has fewer known days than the window or
+        invested nothing in it
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), amounts.shape)
+    known = ~np.isnan(prices)
+    bought = known & (amounts > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = np.where(bought, amounts / prices, 0.0)
+    cost = np.where(bought, amounts, 0.0)
+
+    pad = [(0, 0)] * (amounts.ndim - 1) + [(1, 0)]
+    cum_units = np.pad(np.cumsum(units, axis=-1), pad)
+    cum_cost = np.pad(np.cumsum(cost, axis=-1), pad)
+    # counts[..., d] is the number of known days up to and including day d
+    counts = np.cumsum(known, axis=-1)
+    total = counts[..., -1:]
+    end = np.argmax(counts >= np.maximum(total, 1), axis=-1)[..., None]
+    final_price = np.take_along_axis(prices, end, axis=-1)
+
+    returns = np.full(amounts.shape[:-1] + (len(lookbacks),), np.nan)
+    for i, days in enumerate(lookbacks):
+        before = total - days
+        # Padded prefix index just past the last day outside the window
+        start = np.where(before > 0, np.argmax(counts >= np.maximum(before, 1), axis=-1)[..., None] + 1, 0)
+        period_cost = (np.take_along_axis(cum_cost, end + 1, axis=-1)
+                       - np.take_along_axis(cum_cost, start, axis=-1))
+        value = (np.take_along_axis(cum_units, end + 1, axis=-1)
+                 - np.take_along_axis(cum_units, start, axis=-1)) * final_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[..., i] = np.where((before >= 0) & (period_cost > 0) & (days > 0),
+                                       (value - period_cost) / period_cost * 100, np.nan)[..., 0]
+    return returns
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+import hashlib
+import os
+import numpy as np
+
+from app import indicators
+
+
+# Indicator name -> batch function taking the price array first
+INDICATORS: Dict[str, Callable[..., np.ndarray]] = {
+    'sma': indicators.sma,
+    'ema': indicators.ema,
+    'rsi': indicators.rsi,
+    'momentum': indicators.momentum,
+}
+
+# Funds whose features a FeatureCache keeps, from FUND_FEATURE_FUNDS
+DEFAULT_MAX_FUNDS = int(os.environ.get('FUND_FEATURE_FUNDS') or 256)
+
+
+def fingerprint(prices: np.ndarray) -> str:
+    """Content hash of a price series"""
+    return hashlib.sha1(np.ascontiguousarray(prices, dtype=np.float64).tobytes()).hexdigest()
+
+
+class FundFeatures:
+    """Indicator series of one fund, each computed at most once"""
+
+    def __init__(self, prices: np.ndarray, fund_code: str = '') -> None:
+        self.fund_code = fund_code
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self._series: Dict[Tuple, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, *params) -> np.ndarray:
+        """Series of indicator `name` with the given parameters
+
+        Args:
+            name: Key in INDICATORS
+            params: Positional parameters after the price array, e.g. the period
+        """
+        key = (name, *params)
+        series = self._series.get(key)
+        if series is None:
+            self.misses += 1
+            series = INDICATORS[name](self.prices, *params)
+            series.setflags(write=False)  # Shared by every caller
+            self._series[key] = series
+        else:
+            self.hits += 1
+        return series
+
+    def sma(self, window: int) -> np.ndarray:
+        return self.get('sma', window)
+
+    def ema(self, span: int) -> np.ndarray:
+        return self.get('ema', span)
+
+    def rsi(self, period: int = 14, method: str = 'simple') -> np.ndarray:
+        return self.get('rsi', period, method)
+
+    def momentum(self, days: int) -> np.ndarray:
+        return self.get('momentum', days)
+
+
+class FeatureCache:
+    """FundFeatures per (fund code, data fingerprint), shared by strategies and services
+
+    A fund whose data changed gets a new fingerprint and therefore fresh
+    features; the stale entry is dropped. At most max_funds funds are kept,
+    least recently used first out, so a long run over a large universe
+    holds a bounded working set.
+    """
+
+    def __init__(self, max_funds: int = DEFAULT_MAX_FUNDS) -> None:
+        self.max_funds = max_funds
+        self._funds: 'OrderedDict[str, Tuple[str, FundFeatures]]' = OrderedDict()
+        self.evictions = 0
+
+    def features(self, fund_code: str, prices: np.ndarray) -> FundFeatures:
+        prices = np.asarray(prices, dtype=np.float64)
+        digest = fingerprint(prices)
+        cached = self._funds.get(fund_code)
+        if cached is None or cached[0] != digest:
+            cached = (digest, FundFeatures(prices, fund_code))
+            self._funds[fund_code] = cached
+            while len(self._funds) > self.max_funds:
+                self._funds.popitem(last=False)
+                self.evictions += 1
+        self._funds.move_to_end(fund_code)
+        return cached[1]
+
+    def clear(self) -> None:
+        self._funds.clear()
+
+    def stats(self) -> Dict[str, int]:
+        features = [f for _, f in self._funds.values()]
+        return {
+            'funds': len(features),
+            'series': sum(len(f._series) for f in features),
+            'hits': sum(f.hits for f in features),
+            'misses': sum(f.misses for f in features),
+            'evictions': self.evictions,
+        }
+
+
+# Process-wide cache used by the comparison services
+feature_cache = FeatureCache()
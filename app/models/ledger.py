@@ -0,0 +1,97 @@
+from typing import Dict, Iterator, Sequence, Tuple
+import numpy as np
+
+
+def to_day_numbers(dates: Sequence[str]) -> np.ndarray:
+    """'YYYY-MM-DD' dates as days since 1970-01-01"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def to_date_strings(days: np.ndarray) -> np.ndarray:
+    """Inverse of to_day_numbers"""
+    return np.datetime_as_string(np.asarray(days, dtype=np.int64).astype('datetime64[D]'))
+
+
+class Ledger:
+    """Append-only trade table stored column by column
+
+    Every column is a NumPy array that doubles its capacity when full, so
+    appends are amortized O(1) and a run with tens of thousands of trades
+    keeps a handful of arrays instead of one object per trade. Dates are
+    stored as day numbers (see to_day_numbers).
+
+    ledger['amount'] is a read-only view of the filled part of a column.
+    Iterating yields (date string, value, ...) tuples in column order, the
+    layout of the old transaction lists.
+    """
+
+    def __init__(self, columns: Dict[str, type], capacity: int = 16) -> None:
+        self.columns = {'date': np.int64, **columns}
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.columns.items()}
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, columns: Dict[str, type], dates: np.ndarray, **values: np.ndarray) -> 'Ledger':
+        """Ledger holding whole columns at once, dates as day numbers or strings"""
+        ledger = cls(columns, capacity=max(len(dates), 1))
+        ledger.extend(dates, **values)
+        return ledger
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._data['date'])
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def append(self, date: str | int, *values) -> None:
+        """Add one trade, values in column order"""
+        self._reserve(self._size + 1)
+        i = self._size
+        self._data['date'][i] = date if isinstance(date, (int, np.integer)) else to_day_numbers(date)
+        for name, value in zip(list(self._data)[1:], values):
+            self._data[name][i] = value
+        self._size += 1
+
+    def extend(self, dates: np.ndarray, **values: np.ndarray) -> None:
+        """Add many trades, one array per column"""
+        dates = np.asarray(dates)
+        if dates.dtype.kind in 'UOS':
+            dates = to_day_numbers(dates)
+        start, end = self._size, self._size + len(dates)
+        self._reserve(end)
+        self._data['date'][start:end] = dates
+        for name, column in values.items():
+            self._data[name][start:end] = column
+        self._size = end
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        view = self._data[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Trade dates as 'YYYY-MM-DD' strings"""
+        return to_date_strings(self['date'])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple]:
+        columns = [self.dates.tolist()] + [self[name].tolist() for name in list(self._data)[1:]]
+        return iter(zip(*columns))
+
+    def __repr__(self) -> str:
+        return "Ledger({} trades, columns={})".format(self._size, list(self.columns))
+
+
+# Columns of Investment.transactions: (date, units, amount)
+INVESTMENT_COLUMNS = {'units': np.float64, 'amount': np.float64}
+
+# Columns of the trader fill history, side is BUY or SELL
+BUY, SELL = 1, -1
+TRADE_COLUMNS = {'side': np.int8, 'price': np.float64, 'quantity': np.float64}
@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+from app.models.engine import ENHANCED_RSI_TIERS, tier_amounts, sweep_stop_loss
+
+# (prices, rsi) of the funds evaluated in this process, set by _load_funds
+_funds: List[Tuple[np.ndarray, np.ndarray]] = []
+
+
+def evaluate_tiers(prices: np.ndarray, rsi: np.ndarray, cuts: np.ndarray, amounts: np.ndarray,
+                   stop_loss_threshold: float = 0.08) -> np.ndarray:
+    """Profit rate in percent of every candidate tier set on one fund
+
+    Args:
+        prices: Net values of the fund
+        rsi: RSI series of the fund, computed once and shared by all candidates
+        cuts: candidates x tiers RSI cut points, see tier_amounts
+        amounts: candidates x tiers amounts
+        stop_loss_threshold: Stop-loss of the backtest, as in calculate_investment
+    """
+    rates = sweep_stop_loss(prices, tier_amounts(rsi, cuts, amounts), [stop_loss_threshold])
+    return rates['profit_rate'][:, 0]
+
+
+def _load_funds(funds: List[Tuple[np.ndarray, np.ndarray]]) -> None:
+    global _funds
+    _funds = funds
+
+
+def _evaluate_funds(rows: Sequence[int], cuts: np.ndarray, amounts: np.ndarray,
+                    stop_loss_threshold: float) -> np.ndarray:
+    """funds x candidates profit rates of the given rows of _funds"""
+    return np.array([evaluate_tiers(*_funds[row], cuts, amounts, stop_loss_threshold)
+                     for row in rows]).reshape(len(rows), len(cuts))
+
+
+class TierEvaluator:
+    """Mean profit rate of candidate tier sets over a set of funds, split across processes
+
+    Each worker receives the funds once; a generation then only ships the
+    candidates. With one worker everything runs in this process.
+    """
+
+    def __init__(self, funds: List[Tuple[np.ndarray, np.ndarray]], workers: int = 1,
+                 stop_loss_threshold: float = 0.08) -> None:
+        self.funds = funds
+        self.stop_loss_threshold = stop_loss_threshold
+        # Contiguous chunks of about equal total length, one per worker
+        workers = max(1, min(workers, len(funds)))
+        bounds = np.cumsum([len(prices) for prices, _ in funds], dtype=np.float64)
+        edges = np.searchsorted(bounds, bounds[-1] * np.arange(1, workers) / workers) if funds else []
+        self.chunks = [chunk.tolist() for chunk in np.split(np.arange(len(funds)), edges) if len(chunk)]
+        self.pool = None
+        if len(self.chunks) > 1:
+            self.pool = ProcessPoolExecutor(max_workers=len(self.chunks), initializer=_load_funds,
+                                            initargs=(funds,))
+
+    def __call__(self, cuts: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """funds x candidates profit rates"""
+        if not self.funds:
+            return np.empty((0, len(cuts)))
+        if self.pool is None:
+            _load_funds(self.funds)
+            return _evaluate_funds(range(len(self.funds)), cuts, amounts, self.stop_loss_threshold)
+        parts = self.pool.map(_evaluate_funds, self.chunks, [cuts] * len(self.chunks),
+                              [amounts] * len(self.chunks), [self.stop_loss_threshold] * len(self.chunks))
+        return np.concatenate(list(parts))
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def normalize_tiers(cuts: np.ndarray, amounts: np.ndarray, rsi_range: Tuple[int, int] = (1, 60),
+                    max_amount: float = 8000.0, step: float = 100.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Valid candidates: strictly increasing integer cuts within rsi_range, amounts in multiples of
+    step with the largest equal to max_amount
+
+    Profit rate does not change when every amount is scaled by the same
+    factor, so fixing the largest one removes a direction the search
+    could otherwise drift along forever.
+    """
+    low, high = rsi_range
+    n_tiers = cuts.shape[-1]
+    cuts = np.sort(np.round(cuts), axis=-1)
+    # Spread duplicates upwards, then keep the top tiers inside the range
+    cuts = np.maximum.accumulate(cuts - np.arange(n_tiers), axis=-1) + np.arange(n_tiers)
+    cuts = np.clip(cuts, low + np.arange(n_tiers), high - np.arange(n_tiers)[::-1])
+
+    amounts = np.maximum(amounts, 0.0)
+    top = amounts.max(axis=-1, keepdims=True)
+    amounts = np.where(top > 0, amounts / np.where(top > 0, top, 1) * max_amount, max_amount)
+    return cuts, np.round(amounts / step) * step
+
+
+def evolve_tiers(funds: List[Tuple[np.ndarray, np.ndarray]], population: int = 48,
+                 generations: int = 100, patience: int = 10, min_delta: float = 0.01,
+                 holdout_fraction: float = 0.25, elite: int = 4, seed: int = 0,
+                 workers: int = 1, stop_loss_threshold: float = 0.08,
+                 rsi_range: Tuple[int, int] = (1, 60), verbose: bool = True) -> Dict[str, object]:
+    """Evolutionary search for the RSI tiers that maximise the mean profit rate over funds
+
+    An elitist genetic algorithm: the `elite` best tier sets
+    survive unchanged, the rest of each generation are children of
+    tournament-selected parents (uniform crossover, then Gaussian steps on
+    the cuts and log-normal ones on the amounts). Every distinct candidate
+    is evaluated once, on the training funds only. The search stops after
+    `patience` generations without the best training score improving by
+    min_delta percentage points.
+
+    Args:
+        funds: (prices, rsi) per fund, RSI computed once per fund
+        population: Candidates per generation
+        generations: Upper bound on generations
+        patience: Generations without improvement before stopping early
+        min_delta: Improvement in percentage points that resets patience
+        holdout_fraction: Share of funds kept out of training to check overfitting
+        elite: Best candidates carried over unchanged
+        seed: Seed of the fund split and the search
+        workers: Processes evaluating candidates
+        stop_loss_threshold: Stop-loss of the backtest
+        rsi_range: Lowest and highest allowed cut point
+        verbose: Print one line per generation
+    Returns:
+        'cuts', 'amounts': the best tiers; 'train', 'holdout': their mean
+        profit rates; 'default_train', 'default_holdout': the same for
+        ENHANCED_RSI_TIERS; 'history': per generation best/mean training
+        score and holdout score of the best; 'evaluations'; 'train_funds',
+        'holdout_funds': indices into funds
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(funds))
+    n_holdout = int(round(len(funds) * holdout_fraction)) if len(funds) > 1 else 0
+    holdout_funds, train_funds = np.sort(order[:n_holdout]), np.sort(order[n_holdout:])
+    n_tiers = len(ENHANCED_RSI_TIERS[0])
+    low, high = rsi_range
+
+    train = TierEvaluator([funds[i] for i in train_funds], workers, stop_loss_threshold)
+    holdout = TierEvaluator([funds[i] for i in holdout_funds], 1, stop_loss_threshold)
+    scores: Dict[tuple, float] = {}
+
+    def score(cuts: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        keys = [tuple(c) + tuple(a) for c, a in zip(cuts.tolist(), amounts.tolist())]
+        # First occurrence of every candidate not scored yet
+        new = list({key: i for i, key in reversed(list(enumerate(keys))) if key not in scores}.values())
+        if new:
+            rates = train(cuts[new], amounts[new]).mean(axis=0)
+            scores.update((keys[i], float(rate)) for i, rate in zip(new, rates))
+        return np.array([scores[key] for key in keys])
+
+    def holdout_score(cuts: np.ndarray, amounts: np.ndarray) -> float:
+        rates = holdout(cuts[None], amounts[None])
+        return float(rates.mean()) if len(rates) else float('nan')
+
+    default_cuts, default_amounts = (np.array([tiers], dtype=np.float64) for tiers in ENHANCED_RSI_TIERS)
+    random_cuts = rng.uniform(low, high, (population - 1, n_tiers))
+    random_amounts = np.exp(rng.uniform(np.log(100), np.log(8000), (population - 1, n_tiers)))
+    cuts, amounts = normalize_tiers(np.vstack([default_cuts, random_cuts]),
+                                    np.vstack([default_amounts, random_amounts]), rsi_range)
+
+    history = []
+    best_score, stale = -np.inf, 0
+    try:
+        for generation in range(generations):
+            fitness = score(cuts, amounts)
+            ranked = np.argsort(-fitness, kind='stable')
+            cuts, amounts, fitness = cuts[ranked], amounts[ranked], fitness[ranked]
+            history.append({'generation': generation, 'best': float(fitness[0]),
+                            'mean': float(fitness.mean()), 'holdout': holdout_score(cuts[0], amounts[0]),
+                            'evaluations': len(scores)})
+            if verbose:
+                print("Generation {}: best {:.2f}%, mean {:.2f}%, holdout {:.2f}%, {} evaluated".format(
+                    generation, history[-1]['best'], history[-1]['mean'], history[-1]['holdout'], len(scores)))
+
+            if fitness[0] > best_score + min_delta:
+                best_score, stale = fitness[0], 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    break
+
+            # Tournaments of three, then uniform crossover and mutation
+            n_children = population - elite
+            contenders = rng.integers(0, population, (2, n_children, 3))
+            parents = contenders.min(axis=-1)
+            mix = rng.random((n_children, 2 * n_tiers)) < 0.5
+            child_cuts = np.where(mix[:, :n_tiers], cuts[parents[0]], cuts[parents[1]])
+            child_amounts = np.where(mix[:, n_tiers:], amounts[parents[0]], amounts[parents[1]])
+            mutate = rng.random((n_children, 2 * n_tiers)) < 0.5
+            child_cuts = child_cuts + mutate[:, :n_tiers] * rng.normal(0, 3, (n_children, n_tiers))
+            child_amounts = child_amounts * np.exp(mutate[:, n_tiers:] * rng.normal(0, 0.4, (n_children, n_tiers)))
+            child_cuts, child_amounts = normalize_tiers(child_cuts, child_amounts, rsi_range)
+            cuts = np.vstack([cuts[:elite], child_cuts])
+            amounts = np.vstack([amounts[:elite], child_amounts])
+
+        return {
+            'cuts': cuts[0].tolist(),
+            'amounts': amounts[0].tolist(),
+            'train': float(score(cuts[:1], amounts[:1])[0]),
+            'holdout': holdout_score(cuts[0], amounts[0]),
+            'default_train': float(score(default_cuts, default_amounts)[0]),
+            'default_holdout': holdout_score(default_cuts[0], default_amounts[0]),
+            'history': history,
+            'evaluations': len(scores),
+            'train_funds': train_funds.tolist(),
+            'holdout_funds': holdout_funds.tolist(),
+        }
+    finally:
+        train.close()
+        holdout.close()
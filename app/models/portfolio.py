@@ -0,0 +1,121 @@
+from typing import Callable, Dict
+import numpy as np
+
+
+def pro_rata_allocation(wanted: np.ndarray, cash: float) -> np.ndarray:
+    """Scale every wanted amount down by the same factor"""
+    return wanted * (cash / wanted.sum())
+
+
+def priority_allocation(wanted: np.ndarray, cash: float) -> np.ndarray:
+    """Fill the largest wanted amounts (the strongest signals) first, the last one partially"""
+    order = np.argsort(-wanted, kind='stable')
+    before = np.cumsum(wanted[order]) - wanted[order]
+    allocated = np.empty_like(wanted)
+    allocated[order] = np.clip(cash - before, 0.0, wanted[order])
+    return allocated
+
+
+# Rule used when the funds want more than the cash left
+ALLOCATION_RULES: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    'pro_rata': pro_rata_allocation,
+    'priority': priority_allocation,
+}
+
+
+def forward_fill(prices: np.ndarray) -> np.ndarray:
+    """Last known price of every fund on every date, NaN before its first price"""
+    known = ~np.isnan(prices)
+    last = np.maximum.accumulate(np.where(known, np.arange(len(prices))[:, None], 0), axis=0)
+    return prices[last, np.arange(prices.shape[1])]
+
+
+def run_portfolio(prices: np.ndarray, amounts: np.ndarray, initial_cash: float = 1000000.0,
+                  max_fund_weight: float | None = 0.05, allocation: str = 'pro_rata',
+                  stop_loss_threshold: float | None = 0.08) -> Dict[str, np.ndarray]:
+    """Run one strategy over many funds that share a single cash pool
+
+    Args:
+        prices: dates x funds net values, NaN where a fund has no value
+        amounts: dates x funds amounts the strategy wants to invest
+        initial_cash: Cash shared by all funds
+        max_fund_weight: Cap on each fund's cost basis as a share of initial_cash
+        allocation: Key in ALLOCATION_RULES, applied when the wanted amounts exceed the cash
+        stop_loss_threshold: Sell a fund's position back to cash when its loss
+            exceeds this percentage, None to hold
+    Returns:
+        'value' and 'cash' per date, 'invested' and 'liquidated' dates x funds,
+        final 'units' and 'cost' per fund, and the realised stop-loss 'loss'
+        per fund
+
+    Every step is one date: stop-loss checks, caps, allocation and buys are
+    array operations over all funds, so the Python loop runs once per date
+    whatever the number of funds. A day with a liquidation buys nothing for
+    that fund, as in calculate_investment. Funds without a value on a date
+    neither trade nor get checked and keep their last known price.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    allocate = ALLOCATION_RULES[allocation]
+    n_dates, n_funds = prices.shape
+    tradable = ~np.isnan(prices)
+    filled = forward_fill(prices)
+    cap = None if max_fund_weight is None else max_fund_weight * initial_cash
+
+    cash = float(initial_cash)
+    units = np.zeros(n_funds)
+    cost = np.zeros(n_funds)
+    loss = np.zeros(n_funds)
+    values = np.empty(n_dates)
+    cash_history = np.empty(n_dates)
+    invested = np.zeros((n_dates, n_funds))
+    liquidated = np.zeros((n_dates, n_funds), dtype=bool)
+
+    for t in range(n_dates):
+        price = filled[t]
+        held = np.where(units > 0, units * price, 0.0)
+
+        if stop_loss_threshold is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                breach = tradable[t] & (cost > 0) & ((cost - held) / cost > stop_loss_threshold)
+            if breach.any():
+                cash += held[breach].sum()
+                loss[breach] += cost[breach] - held[breach]
+                units[breach] = 0.0
+                cost[breach] = 0.0
+                held[breach] = 0.0
+                liquidated[t] = breach
+
+        wanted = np.where(tradable[t] & ~liquidated[t] & (amounts[t] > 0), amounts[t], 0.0)
+        if cap is not None:
+            wanted = np.minimum(wanted, np.maximum(cap - cost, 0.0))
+        total = wanted.sum()
+        if total > cash:
+            wanted = allocate(wanted, cash) if cash > 0 else np.zeros(n_funds)
+            total = wanted.sum()
+            if total > cash:
+                # Scale an allocation above the cash down to it, so each fund's cost
+                # books what was paid
+                wanted = wanted * (cash / total)
+                total = cash
+
+        if total > 0:
+            bought = wanted > 0
+            units[bought] += wanted[bought] / price[bought]
+            cost += wanted
+            held[bought] = units[bought] * price[bought]
+            cash -= total
+            invested[t] = wanted
+
+        cash_history[t] = cash
+        values[t] = cash + held.sum()
+
+    return {
+        'value': values,
+        'cash': cash_history,
+        'invested': invested,
+        'liquidated': liquidated,
+        'units': units,
+        'cost': cost,
+        'loss': loss,
+    }
@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Dict
+import functools
+import hashlib
+import inspect
+import numpy as np
+
+from app.models.features import FundFeatures
+from app.models.engine import VECTORIZED_STRATEGIES
+from app.indicators import RSI, SMA
+from app.models.strategy import (ma_5_strategy, rsi_strategy, enhanced_rsi_strategy,
+                                 ma_amount, near_tie, rsi_amount, enhanced_rsi_amount)
+
+
+@functools.lru_cache(maxsize=None)
+def source_hash(*objs: Any) -> str:
+    """Short hash of the source code of functions or classes, read once per process"""
+    digest = hashlib.sha1()
+    for obj in objs:
+        try:
+            digest.update(inspect.getsource(obj).encode())
+        except (OSError, TypeError):
+            digest.update(repr(obj).encode())
+    return digest.hexdigest()[:12]
+
+
+class Strategy(ABC):
+    """Investment strategy that can run one net value at a time or over a whole series
+
+    init() resets the state, update(price) takes the next day's net value
+    and returns the amount to invest that day, and batch(prices) returns
+    the amounts for a whole series at once. Both modes give the same
+    amounts, so a strategy backtested with batch() can be fed new data
+    with update() without reloading its history.
+    """
+    name = 'strategy'
+
+    def init(self) -> None:
+        pass
+
+    @abstractmethod
+    def update(self, price: float) -> float:
+        """Amount to invest on the day with net value price"""
+        pass
+
+    def batch(self, prices: np.ndarray | FundFeatures) -> np.ndarray:
+        """Amounts for every day of a series, by default update() in a loop"""
+        prices = prices.prices if isinstance(prices, FundFeatures) else prices
+        self.init()
+        return np.array([self.update(price) for price in np.asarray(prices, dtype=np.float64).tolist()])
+
+    def identity(self) -> Dict[str, Any]:
+        """What determines this strategy's amounts, used as its result cache key
+
+        Subclasses with parameters must include them; the version changes
+        whenever the class's source does.
+        """
+        cls = type(self)
+        return {'name': '{}.{}'.format(cls.__module__, cls.__qualname__),
+                'version': source_hash(*cls.__mro__[:-1])}
+
+    def __repr__(self) -> str:
+        return "{}({})".format(type(self).__name__, self.name)
+
+
+class FunctionStrategy(Strategy):
+    """Strategy from a per-day function f(current_value, prev_value, date_index, **params)"""
+
+    def __init__(self, func: Callable, **params) -> None:
+        self.func = func
+        self.params = params
+        self.name = func.__name__
+        self.init()
+
+    def init(self) -> None:
+        self.prev_value = None
+        self.index = 0
+
+    def update(self, price: float) -> float:
+        amount = self.func(price, self.prev_value, self.index, **self.params)
+        self.prev_value = price
+        self.index += 1
+        return amount
+
+    def batch(self, prices: np.ndarray | FundFeatures) -> np.ndarray:
+        vectorized = VECTORIZED_STRATEGIES.get(self.func)
+        if vectorized is None:
+            return super().batch(prices)
+        features = prices if isinstance(prices, FundFeatures) else FundFeatures(prices)
+        return vectorized(features, **self.params)
+
+    def identity(self) -> Dict[str, Any]:
+        identity = super().identity()
+        functions = [self.func] + [f for f in [VECTORIZED_STRATEGIES.get(self.func)] if f is not None]
+        identity.update(function='{}.{}'.format(self.func.__module__, self.func.__qualname__),
+                        function_version=source_hash(*functions), params=self.params)
+        return identity
+
+
+class HistoryStrategy(FunctionStrategy):
+    """Strategy from a per-day function that also reads the price history
+
+    Only the last `lookback` prices before today are kept, and the function
+    sees them as its whole price_history with today at the end, so memory
+    stays bounded however long the stream runs. Replaying the window costs
+    O(lookback) per update; the built-in history strategies have O(1)
+    streaming adapters instead (HISTORY_STRATEGIES).
+    """
+
+    def __init__(self, func: Callable, lookback: int, **params) -> None:
+        self.lookback = lookback
+        super().__init__(func, **params)
+
+    def init(self) -> None:
+        super().init()
+        self.history: deque = deque(maxlen=self.lookback + 1)
+
+    def update(self, price: float) -> float:
+        self.history.append(price)
+        # Index of today within the kept history
+        date_index = min(self.index, self.lookback)
+        amount = self.func(price, self.prev_value, date_index, list(self.history), **self.params)
+        self.prev_value = price
+        self.index += 1
+        return amount
+
+    def identity(self) -> Dict[str, Any]:
+        return {**super().identity(), 'lookback': self.lookback}
+
+
+class MovingAverageStrategy(FunctionStrategy):
+    """ma_5_strategy on a streaming SMA of the days before today, O(1) per update"""
+
+    def __init__(self, func: Callable = ma_5_strategy, **params) -> None:
+        super().__init__(func, **params)
+
+    def init(self) -> None:
+        super().init()
+        self.sma = SMA(self.params.get('ma_short', 5))
+
+    def update(self, price: float) -> float:
+        amount = 0.0
+        if self.sma.ready:
+            short_ma = self.sma.value
+            amount = ma_amount(price, self.sma.exact() if near_tie(price, short_ma) else short_ma)
+        self.sma.update(price)
+        self.prev_value = price
+        self.index += 1
+        return amount
+
+
+class RSIStrategy(FunctionStrategy):
+    """rsi_strategy or enhanced_rsi_strategy on a streaming RSI, O(1) per update"""
+
+    def __init__(self, func: Callable = rsi_strategy, **params) -> None:
+        super().__init__(func, **params)
+        self.amount = RSI_AMOUNTS[func]
+
+    def init(self) -> None:
+        super().init()
+        self.rsi = RSI(self.params.get('period', 14))
+
+    def update(self, price: float) -> float:
+        rsi = self.rsi.update(price)
+        amount = self.amount(rsi) if self.rsi.ready else 0.0
+        self.prev_value = price
+        self.index += 1
+        return amount
+
+
+# RSI strategy function -> its amount at a given RSI
+RSI_AMOUNTS: Dict[Callable, Callable[[float], float]] = {
+    rsi_strategy: rsi_amount,
+    enhanced_rsi_strategy: enhanced_rsi_amount,
+}
+
+# History strategy -> streaming adapter
+HISTORY_STRATEGIES: Dict[Callable, type] = {
+    ma_5_strategy: MovingAverageStrategy,
+    rsi_strategy: RSIStrategy,
+    enhanced_rsi_strategy: RSIStrategy,
+}
+
+
+def as_strategy(func: Callable | Strategy, **params) -> Strategy:
+    """Wrap one of the per-day strategy functions in the Strategy interface"""
+    if isinstance(func, Strategy):
+        return func
+    if func in HISTORY_STRATEGIES:
+        return HISTORY_STRATEGIES[func](func, **params)
+    return FunctionStrategy(func, **params)
@@ -3,6 +3,9 @@ from typing import TypedDict, List, Callable
 from abc import ABC, abstractmethod
 import math
 
+from app.indicators import rsi_at, sma_at
+from app.models.ledger import Ledger, INVESTMENT_COLUMNS
+
 
 class FundData(TypedDict):
     FSRQ: str  # Date
@@ -16,7 +19,7 @@ class Investment:
         self.total_cost = 0.0           # Current cost basis
         self.loss = 0.0  # Total loss
         # Date, units, cost
-        self.transactions: List[tuple[str, float, float]] = []
+        self.transactions = Ledger(INVESTMENT_COLUMNS)
 
 
 def fixed_drop_strategy(current_value: float, prev_value: float | None, _: int) -> float:
@@ -54,10 +57,20 @@ def ma_5_strategy(current_value: float, prev_value: float | None, date_index: in
     if date_index < ma_short:  # Need at least 5 days of data
         return 0.0
 
-    # Calculate 5-day MA
-    short_ma = sum(price_history[date_index-ma_short:date_index]) / ma_short
+    # 5-day MA of the days before today, streamed when price_history is a PriceHistory
+    short_ma = sma_at(price_history, date_index - 1, ma_short)
+    if near_tie(current_value, short_ma):
+        short_ma = sum(price_history[date_index-ma_short:date_index]) / ma_short
+    return ma_amount(current_value, short_ma)
+
+
+def near_tie(current_value: float, short_ma: float) -> bool:
+    """Whether a streamed average is within rounding of the price, where only sum() decides"""
+    return abs(current_value - short_ma) <= 1e-9 * abs(current_value)
+
 
-    # Buy signal: current price <= 5-day MA
+def ma_amount(current_value: float, short_ma: float) -> float:
+    """Buy signal of ma_5_strategy: current price <= 5-day MA"""
     if current_value <= short_ma:
         return 1000.0
     return 0.0
@@ -87,26 +100,11 @@ def rsi_strategy(current_value: float, prev_value: float | None, date_index: int
     if date_index < period:
         return 0.0
 
-    # Calculate RSI
-    gains, losses = [], []
-    for i in range(date_index - period, date_index):
-        change = price_history[i+1] - price_history[i]
-        if change >= 0:
-            gains.append(change)
-            losses.append(0)
-        else:
-            gains.append(0)
-            losses.append(abs(change))
-
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
-
-    if avg_loss == 0:
-        return 0.0
+    return rsi_amount(rsi_at(price_history, date_index, period))
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
 
+def rsi_amount(rsi: float) -> float:
+    """Amount of rsi_strategy at a given RSI"""
     # Simple threshold-based investment
     if rsi < 30:
         return 1000.0
@@ -126,21 +124,11 @@ def enhanced_rsi_strategy(current_value: float, prev_value: float | None, date_i
     if date_index < period:
         return 0.0
 
-    # Calculate RSI
-    changes = [price_history[i+1] - price_history[i]
-               for i in range(date_index - period, date_index)]
-    gains = [change if change > 0 else 0 for change in changes]
-    losses = [abs(change) if change < 0 else 0 for change in changes]
-
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
-
-    if avg_loss == 0:
-        return 0.0
+    return enhanced_rsi_amount(rsi_at(price_history, date_index, period))
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
 
+def enhanced_rsi_amount(rsi: float) -> float:
+    """Amount of enhanced_rsi_strategy at a given RSI"""
     # Simplified but more aggressive position sizing
     if rsi < 15:
         return 8000.0
@@ -159,7 +147,8 @@ def calculate_investment(data: List[FundData], strategy_func: Callable, stop_los
 
     Args:
         data: List of fund data points
-        strategy_func: Investment strategy function
+        strategy_func: Investment strategy function, or a Strategy object
+            (app.models.stateful) fed one net value per day
         stop_loss_threshold: Liquidate position when loss exceeds this percentage (default 5%)
 
     Tracks both current position and historical cumulative amounts:
@@ -168,10 +157,16 @@ def calculate_investment(data: List[FundData], strategy_func: Callable, stop_los
     """
     inv = Investment()
     prev_value = None
+    stateful = hasattr(strategy_func, 'update')
+    if stateful:
+        strategy_func.init()
 
     for idx, day_data in enumerate(data):
         is_redeemed = False
         current_value = float(day_data['DWJZ'])
+        if stateful:
+            # Stateful strategies see every day, including liquidation days
+            planned_amount = strategy_func.update(current_value)
 
         # Check if loss exceeds threshold and clear position if true
         current_portfolio_value = inv.total_units * current_value
@@ -187,14 +182,15 @@ def calculate_investment(data: List[FundData], strategy_func: Callable, stop_los
 
         if not is_redeemed:
             # Get investment amount from strategy
-            investment_amount = strategy_func(current_value, prev_value, idx)
+            if stateful:
+                investment_amount = planned_amount
+            else:
+                investment_amount = strategy_func(current_value, prev_value, idx)
             if investment_amount > 0:
                 units = investment_amount / current_value
                 inv.total_units += units
                 inv.total_cost += investment_amount
-                inv.transactions.append(
-                    (day_data['FSRQ'], units, investment_amount)
-                )
+                inv.transactions.append(day_data['FSRQ'], units, investment_amount)
 
         prev_value = current_value
 
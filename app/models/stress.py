@@ -0,0 +1,70 @@
+from typing import Callable, Sequence
+import numpy as np
+
+from app.models.engine import strategy_amounts, sweep_stop_loss
+from app.models.features import FundFeatures
+
+
+def block_bootstrap(returns: np.ndarray, n_paths: int, length: int, block_size: int,
+                    rng: np.random.Generator) -> np.ndarray:
+    """Resample daily returns in blocks of consecutive days
+
+    Blocks start at random days and wrap around the end of the history
+    (circular block bootstrap), which keeps short-term autocorrelation such
+    as volatility clusters inside each block.
+
+    Returns:
+        n_paths x length resampled returns
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    block_size = max(1, min(block_size, len(returns)))
+    n_blocks = -(-length // block_size)
+    starts = rng.integers(0, len(returns), size=(n_paths, n_blocks, 1))
+    index = (starts + np.arange(block_size)) % len(returns)
+    return returns[index.reshape(n_paths, -1)[:, :length]]
+
+
+def simulate_prices(start_price: float, returns: np.ndarray) -> np.ndarray:
+    """Net value paths from daily returns in percent, as in JZZZL"""
+    return start_price * np.cumprod(1 + returns / 100, axis=-1)
+
+
+def stress_test(start_price: float, returns: np.ndarray, strategy_funcs: Sequence[Callable],
+                n_paths: int = 1000, length: int | None = None, block_size: int = 20,
+                stop_loss_threshold: float = 0.08, seed: int | Sequence[int] = 0,
+                batch_size: int = 1000) -> np.ndarray:
+    """Profit rate of every strategy on bootstrapped net value paths
+
+    Args:
+        start_price: Net value the paths start from
+        returns: Historical daily returns in percent
+        strategy_funcs: Strategies as accepted by strategy_amounts
+        n_paths: Number of synthetic paths
+        length: Days per path, the length of the history by default
+        block_size: Days per bootstrap block
+        stop_loss_threshold: Liquidate position when loss exceeds this percentage
+        seed: Entropy of the random stream, e.g. (seed, fund number) so every
+            fund has its own reproducible stream
+        batch_size: Paths simulated together, bounds memory use
+    Returns:
+        strategies x n_paths profit rates in percent
+
+    Each batch draws from its own child of one SeedSequence, so results only
+    depend on seed and batch_size, not on which process runs them.
+    """
+    length = length or len(returns)
+    n_batches = -(-n_paths // batch_size)
+    streams = np.random.SeedSequence(seed).spawn(n_batches)
+
+    rates = []
+    for batch, stream in enumerate(streams):
+        size = min(batch_size, n_paths - batch * batch_size)
+        rng = np.random.default_rng(stream)
+        prices = simulate_prices(start_price, block_bootstrap(returns, size, length, block_size, rng))
+
+        # paths x strategies x days, every indicator computed for all paths at once
+        features = FundFeatures(prices)
+        amounts = np.stack([strategy_amounts(func, features) for func in strategy_funcs], axis=1)
+        sweep = sweep_stop_loss(prices[:, None, :], amounts, [stop_loss_threshold])
+        rates.append(sweep['profit_rate'][..., 0])
+    return np.concatenate(rates).T
@@ -1,14 +1,10 @@
 from typing import Dict, Any, List
-import pandas as pd
 import matplotlib.pyplot as plt
-from app.models.strategy import (
-    fixed_drop_strategy, dynamic_drop_strategy,
-    periodic_strategy, ma_5_strategy, rsi_strategy,
-    enhanced_rsi_strategy, value_averaging_strategy,
-    calculate_investment
-)
+from app.models.strategy import Investment
+from app.services.comparison.profit import STRATEGIES, run_strategies
 from app.data.fetch import FundData
-from pathlib import Path
+from app.data.panel import read_fund
+from app.services.comparison.runner import run_funds
 import os
 
 
@@ -25,12 +21,12 @@ def analyze_investment_frequency(fund_data: list[FundData], strategy_results: Di
             'frequency_rate': 0,
         }
 
-    amounts = [amount for _, _, amount in transactions]
+    amounts = transactions['amount']
 
     return {
         'total_investments': len(transactions),
-        'avg_amount': sum(amounts) / len(transactions),
-        'max_amount': max(amounts),
+        'avg_amount': float(amounts.sum()) / len(transactions),
+        'max_amount': float(amounts.max()),
         'frequency_rate': (len(transactions) / total_days) * 100
     }
 
@@ -188,60 +184,27 @@ def plot_separate_comparisons(results: dict, output_dir: str):
     plt.close()
 
 
-async def load_fund_data_from_csv(file_path: str) -> List[FundData]:
-    """Load fund data from CSV file"""
-    df = pd.read_csv(file_path)
-    # Convert DataFrame to List[FundData]
-    fund_data = []
-    for _, row in df.iterrows():
-        fund_data.append({
-            'FSRQ': row['FSRQ'],
-            'DWJZ': str(row['DWJZ']),
-            'JZZZL': str(row['JZZZL'])
-        })
-    return fund_data
+def frequency_metrics(fund_data: List[FundData], investments: List[Investment]) -> Dict[str, dict]:
+    """Investment frequency of every strategy from its run_strategies() investment"""
+    return {strategy_name: analyze_investment_frequency(fund_data, investment)
+            for strategy_name, investment in zip(STRATEGIES, investments)}
 
 
-async def analyze_frequencies():
-    """Main function to analyze investment frequencies"""
-    fund_dir = 'data'
-    results = {}
+def fund_frequencies(fund_code: str, file_path: str) -> Dict[str, dict]:
+    """Investment frequency of every strategy on one fund, run by the fund runner"""
+    # Read fund data using the same method as profit.py
+    fund_data = read_fund(fund_code, file_path)
+    return frequency_metrics(fund_data, run_strategies(fund_code, fund_data))
 
-    # Process each fund file
-    for file_name in os.listdir(fund_dir):
-        if not file_name.endswith('.csv'):
-            continue
-
-        fund_code = file_name.split('.')[0]
-        file_path = os.path.join(fund_dir, file_name)
 
+def report_frequencies(results: Dict[str, Dict[str, dict]]) -> None:
+    """Print the per-fund frequencies and save the frequency and total investment reports"""
+    for fund_code, fund_results in results.items():
         print(f"\nAnalyzing fund: {fund_code}")
-
-        # Read fund data using the same method as profit.py
-        fund_data = await load_fund_data_from_csv(file_path)
-        price_history = [float(day['DWJZ']) for day in fund_data]
-
-        results[fund_code] = {}
-
-        strategies = {
-            "Fixed Drop": fixed_drop_strategy,
-            "Dynamic Drop": dynamic_drop_strategy,
-            "Periodic": periodic_strategy,
-            "MA5": lambda c, p, i: ma_5_strategy(c, p, i, price_history),
-            "RSI": lambda c, p, i: rsi_strategy(c, p, i, price_history),
-            "Enhanced RSI": lambda c, p, i: enhanced_rsi_strategy(c, p, i, price_history)
-        }
-
-        for strategy_name, strategy_func in strategies.items():
-            investment = calculate_investment(fund_data, strategy_func)
-            results[fund_code][strategy_name] = analyze_investment_frequency(
-                fund_data, investment)
-
+        for strategy_name, result in fund_results.items():
             print(f"\n{strategy_name}:")
-            print(f"投资次数: {results[fund_code]
-                  [strategy_name]['total_investments']}")
-            print(f"平均投资额: {results[fund_code]
-                  [strategy_name]['avg_amount']:.2f} 元")
+            print(f"投资次数: {result['total_investments']}")
+            print(f"平均投资额: {result['avg_amount']:.2f} 元")
 
     # Create results directory if it doesn't exist
     output_dir = 'results/comparison'
@@ -259,6 +222,15 @@ async def analyze_frequencies():
     print("- results/comparison/total_investment.md")
 
 
+async def analyze_frequencies(workers: int | None = None):
+    """Main function to analyze investment frequencies"""
+    fund_dir = 'data'
+
+    # Process each fund file in parallel
+    results, _ = run_funds(fund_frequencies, fund_dir, workers)
+    report_frequencies(results)
+
+
 if __name__ == "__main__":
     import asyncio
     asyncio.run(analyze_frequencies())
@@ -0,0 +1,41 @@
+from typing import Dict
+
+from app.data.panel import read_fund
+from app.services.comparison.runner import run_funds
+from app.services.comparison.profit import run_strategies, profit_metrics, report_profits
+from app.services.comparison.frequency import frequency_metrics, report_frequencies
+from app.services.comparison.rsi_strategy import rsi_comparison_metrics, report_rsi_comparison
+
+
+def fund_comparison(fund_code: str, file_path: str) -> Dict[str, Dict[str, dict]]:
+    """Every comparison metric of one fund from a single load and backtest
+
+    Returns:
+        {'profit': ..., 'frequency': ..., 'rsi_comparison': ...}, each in the
+        per-fund format of the corresponding service
+    """
+    fund_data = read_fund(fund_code, file_path)
+    investments = run_strategies(fund_code, fund_data)
+    return {
+        'profit': profit_metrics(fund_data, investments),
+        'frequency': frequency_metrics(fund_data, investments),
+        'rsi_comparison': rsi_comparison_metrics(fund_code, fund_data),
+    }
+
+
+async def run_comparison(workers: int | None = None):
+    """profits(), analyze_frequencies() and compare_rsi_strategies() in one pass over the funds
+
+    Each fund is loaded and backtested once; all reports are then written
+    from the same in-memory results.
+    """
+    fund_dir = 'data'
+
+    results, _ = run_funds(fund_comparison, fund_dir, workers)
+
+    def section(name: str) -> Dict[str, Dict[str, dict]]:
+        return {fund_code: fund_results[name] for fund_code, fund_results in results.items()}
+
+    report_profits(section('profit'))
+    report_frequencies(section('frequency'))
+    report_rsi_comparison(section('rsi_comparison'))
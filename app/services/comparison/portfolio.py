@@ -0,0 +1,99 @@
+import os
+from typing import Callable, Dict
+import numpy as np
+import matplotlib.pyplot as plt
+
+from app.models.engine import panel_strategy_amounts
+from app.models.portfolio import run_portfolio
+from app.data.panel import open_panel
+from app.services.comparison.profit import STRATEGIES
+
+
+def panel_amounts(fund_codes: list, prices: np.ndarray, strategy_func: Callable) -> np.ndarray:
+    """dates x funds amounts of one strategy, each fund's signals computed on its own dates"""
+    return panel_strategy_amounts(prices.T, strategy_func).T
+
+
+def plot_portfolio_values(dates: list, results: dict, output_path: str):
+    """Portfolio value over time for every strategy"""
+    plt.figure(figsize=(12, 6))
+    x = np.arange(len(dates))
+    for strategy_name, result in results.items():
+        plt.plot(x, result['value'], label=strategy_name, linewidth=2)
+
+    step = max(1, len(dates) // 10)
+    plt.xticks(x[::step], dates[::step], rotation=45)
+    plt.title('Portfolio Value by Strategy')
+    plt.xlabel('Date')
+    plt.ylabel('Portfolio Value (¥)')
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig(output_path, bbox_inches='tight', dpi=300)
+    plt.close()
+
+
+def generate_portfolio_table(results: dict, initial_cash: float, output_path: str):
+    """Markdown table of the portfolio outcome per strategy"""
+    lines = [
+        "# Portfolio Backtest\n",
+        f"## Shared Cash Pool of {initial_cash:.2f} ¥\n",
+        "| Strategy | Final Value | Profit Rate | Max Drawdown | Min Cash | Funds Held | Stop-Losses |",
+        "|" + "---|" * 7
+    ]
+    for strategy_name, r in results.items():
+        lines.append("| {} | {:.2f} | {:.2f}% | {:.2f}% | {:.2f} | {} | {} |".format(
+            strategy_name, r['final_value'], r['profit_rate'], r['max_drawdown'],
+            r['min_cash'], r['funds_held'], r['stop_losses']))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+
+async def analyze_portfolio(initial_cash: float = 1000000.0, max_fund_weight: float | None = 0.05,
+                            allocation: str = 'pro_rata', stop_loss_threshold: float | None = 0.08):
+    """Run every strategy over all funds at once with one shared cash pool
+
+    Args:
+        initial_cash: Cash shared by all funds
+        max_fund_weight: Cap on each fund's cost basis as a share of initial_cash
+        allocation: 'pro_rata' or 'priority', see ALLOCATION_RULES
+        stop_loss_threshold: Per-fund stop-loss, None to hold
+    """
+    # Memory-mapped dates x funds panel, rebuilt first if any CSV changed
+    store = open_panel('data')
+    dates, fund_codes, prices = store.date_strings, store.codes, store.prices
+    print(f"Loaded {len(fund_codes)} funds over {len(dates)} dates")
+
+    results: Dict[str, dict] = {}
+    for strategy_name, strategy_func in STRATEGIES.items():
+        amounts = panel_amounts(fund_codes, prices, strategy_func)
+        result = run_portfolio(prices, amounts, initial_cash, max_fund_weight,
+                               allocation, stop_loss_threshold)
+
+        values = result['value']
+        result['final_value'] = float(values[-1])
+        result['profit_rate'] = (values[-1] - initial_cash) / initial_cash * 100
+        result['max_drawdown'] = float(np.max(1 - values / np.maximum.accumulate(values)) * 100)
+        result['min_cash'] = float(result['cash'].min())
+        result['funds_held'] = int((result['units'] > 0).sum())
+        result['stop_losses'] = int(result['liquidated'].sum())
+        results[strategy_name] = result
+
+        print(f"\n{strategy_name}:")
+        print(f"最终价值: {result['final_value']:.2f} 元")
+        print(f"收益率: {result['profit_rate']:.2f}%")
+        print(f"最大回撤: {result['max_drawdown']:.2f}%")
+
+    output_dir = 'results/comparison'
+    os.makedirs(output_dir, exist_ok=True)
+    plot_portfolio_values(dates, results, os.path.join(output_dir, 'portfolio.png'))
+    generate_portfolio_table(results, initial_cash, os.path.join(output_dir, 'portfolio.md'))
+    print("\nResults saved to:")
+    print("- results/comparison/portfolio.png")
+    print("- results/comparison/portfolio.md")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(analyze_portfolio())
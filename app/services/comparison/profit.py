@@ -1,78 +1,102 @@
-import os
-import pandas as pd
 from app.models.strategy import (FundData, Investment, fixed_drop_strategy, dynamic_drop_strategy,
                                  periodic_strategy, ma_5_strategy, rsi_strategy, enhanced_rsi_strategy,
-                                 calculate_investment,
                                  value_averaging_strategy)
+import app.models.engine
+import app.models.features
+import app.models.ledger
+import app.models.strategy
+from app import indicators
+from app.models.engine import calculate_investments
+from app.models.stateful import as_strategy, source_hash
+from app.models.features import feature_cache
 
 from app.workers.draw import draw_strategy_comparison
 from app.workers.text import generate_markdown_table
 from app.data.fetch import fetch_fund_data
-from typing import List
-
-
-async def load_fund_data_from_csv(file_path: str) -> List[FundData]:
-    """Load fund data from CSV file"""
-    df = pd.read_csv(file_path)
-    # Convert DataFrame to List[FundData]
-    fund_data = []
-    for _, row in df.iterrows():
-        fund_data.append({
-            'FSRQ': row['FSRQ'],
-            'DWJZ': str(row['DWJZ']),
-            'JZZZL': str(row['JZZZL'])
-        })
-    return fund_data
-
-
-async def profits():
-    # Replace with your fund data directory
-    fund_dir = 'data'
+from app.data.loader import fund_prices
+from app.data.panel import read_fund
+from app.data.cache import open_cache, data_fingerprint, result_key
+from app.services.comparison.runner import run_funds
+from typing import Dict, List
+
+
+# Strategies compared by profits() and analyze_frequencies(), in report order
+STRATEGIES = {
+    "Fixed Drop": as_strategy(fixed_drop_strategy),
+    "Dynamic Drop": as_strategy(dynamic_drop_strategy),
+    "Periodic": as_strategy(periodic_strategy),
+    "MA5": as_strategy(ma_5_strategy),
+    "RSI": as_strategy(rsi_strategy),
+    "Enhanced RSI": as_strategy(enhanced_rsi_strategy)
+}
+
+
+# Version of the backtest engine and indicator code behind run_strategies results: whole
+# modules, so a change to any helper they call (tiers, ledger, RSI smoothing) counts
+ENGINE_VERSION = source_hash(app.models.engine, app.models.features, app.models.ledger,
+                             app.models.strategy, indicators)
+
+
+def run_strategies(fund_code: str, fund_data: List[FundData],
+                   stop_loss_threshold: float = 0.08) -> List[Investment]:
+    """Backtest every strategy in STRATEGIES on one fund
+
+    Investments come from the result cache when this fund's data and the
+    strategy are unchanged since they were computed; only the rest are run.
+    """
+    strategies = list(STRATEGIES.values())
+
+    def compute(indices: List[int]) -> List[Investment]:
+        # MA/RSI series are computed once per fund and shared by all its strategies
+        features = feature_cache.features(
+            fund_code, fund_prices(fund_data))
+
+        # All strategies advance together in one run over the fund
+        return calculate_investments(fund_data, [strategies[i] for i in indices],
+                                     stop_loss_threshold, features=features)
+
+    cache = open_cache()
+    if cache is None:
+        return compute(list(range(len(strategies))))
+    data_hash = data_fingerprint(fund_data)
+    keys = [result_key(data_hash, strategy, engine=ENGINE_VERSION, stop_loss_threshold=stop_loss_threshold)
+            for strategy in strategies]
+    return cache.get_or_compute(keys, compute)
+
+
+def profit_metrics(fund_data: List[FundData], investments: List[Investment]) -> Dict[str, dict]:
+    """Profit of every strategy from its run_strategies() investment"""
     results = {}
-
-    # Process each fund file
-    for file_name in os.listdir(fund_dir):
-        if not file_name.endswith('.csv'):
-            continue
-
-        fund_code = file_name.split('.')[0]
-        file_path = os.path.join(fund_dir, file_name)
-
-        print(f"\nProcessing fund: {fund_code}")
-        fund_data = await load_fund_data_from_csv(file_path)
-
-        # Convert price history for MA and RSI calculations
-        price_history = [float(day['DWJZ']) for day in fund_data]
-
-        strategies = {
-            "Fixed Drop": fixed_drop_strategy,
-            "Dynamic Drop": dynamic_drop_strategy,
-            "Periodic": periodic_strategy,
-            "MA5": lambda c, p, i: ma_5_strategy(c, p, i, price_history),
-            "RSI": lambda c, p, i: rsi_strategy(c, p, i, price_history),
-            "Enhanced RSI": lambda c, p, i: enhanced_rsi_strategy(c, p, i, price_history)
+    for strategy_name, investment in zip(STRATEGIES, investments):
+        final_value = float(fund_data[-1]['DWJZ']) * investment.total_units
+        profit = final_value - investment.total_cost
+        profit_rate = (profit / investment.total_cost) * \
+            100 if investment.total_cost > 0 else 0
+
+        results[strategy_name] = {
+            'total_cost': investment.total_cost,
+            'total_units': investment.total_units,
+            'final_value': final_value,
+            'profit': profit,
+            'profit_rate': profit_rate
         }
+    return results
 
-        results[fund_code] = {}
 
-        for strategy_name, strategy_func in strategies.items():
-            investment = calculate_investment(fund_data, strategy_func)
-            final_value = float(fund_data[-1]['DWJZ']) * investment.total_units
-            profit = final_value - investment.total_cost
-            profit_rate = (profit / investment.total_cost) * \
-                100 if investment.total_cost > 0 else 0
+def fund_profits(fund_code: str, file_path: str) -> Dict[str, dict]:
+    """Profit of every strategy on one fund, run by the fund runner"""
+    fund_data = read_fund(fund_code, file_path)
+    return profit_metrics(fund_data, run_strategies(fund_code, fund_data))
 
-            results[fund_code][strategy_name] = {
-                'total_cost': investment.total_cost,
-                'total_units': investment.total_units,
-                'final_value': final_value,
-                'profit': profit,
-                'profit_rate': profit_rate
-            }
 
+def report_profits(results: Dict[str, Dict[str, dict]]) -> None:
+    """Print the per-fund profits and save the profit chart and table"""
+    for fund_code, fund_results in results.items():
+        print(f"\nProcessing fund: {fund_code}")
+        for strategy_name, result in fund_results.items():
             print(f"\n{strategy_name}:")
-            print(f"总投入: {investment.total_cost:.2f} 元")
-            print(f"收益率: {profit_rate:.2f}%")
+            print(f"总投入: {result['total_cost']:.2f} 元")
+            print(f"收益率: {result['profit_rate']:.2f}%")
 
     # Plot results
     draw_strategy_comparison(results, 'results/comparison/profit.png')
@@ -81,3 +105,12 @@ async def profits():
     # Generate markdown table
     generate_markdown_table(results, 'results/comparison/profit.md')
     print("\nMarkdown table has been generated and saved to 'results/comparison/profit.md'")
+
+
+async def profits(workers: int | None = None):
+    # Replace with your fund data directory
+    fund_dir = 'data'
+
+    # Process each fund file in parallel
+    results, _ = run_funds(fund_profits, fund_dir, workers)
+    report_profits(results)
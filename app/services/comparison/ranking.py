@@ -0,0 +1,98 @@
+import os
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+from app.models.engine import panel_strategy_amounts, trailing_returns
+from app.data.panel import PanelStore, open_panel
+from app.services.comparison.profit import STRATEGIES
+
+# Lookback label -> trading days, at 20 trading days per month
+LOOKBACKS = {'1m': 20, '3m': 60, '6m': 120, '1y': 240}
+
+
+def rank_funds(returns: np.ndarray) -> np.ndarray:
+    """Rank of every fund per column, 1 for the highest return; NaN returns stay unranked"""
+    ranks = np.full(returns.shape, np.nan)
+    for j in range(returns.shape[1]):
+        ranked = np.flatnonzero(~np.isnan(returns[:, j]))
+        order = ranked[np.argsort(-returns[ranked, j], kind='stable')]
+        ranks[order, j] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def fund_rankings(strategy, lookbacks: Dict[str, int] = LOOKBACKS,
+                  store: PanelStore | None = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Returns and ranks of every fund in the panel over every lookback, in one pass
+
+    The strategy's amounts are computed once over each fund's full history
+    and all lookbacks are cut from the same prefix sums (see
+    trailing_returns), so refreshing the whole universe costs one strategy
+    run per fund.
+
+    Args:
+        strategy: Strategy object or per-day function, see strategy_amounts
+        lookbacks: Label -> window length in trading days
+        store: Panel to rank, open_panel('data') by default
+    Returns:
+        (returns, ranks): funds x lookbacks DataFrames indexed by fund code,
+        returns in percent, NaN where a fund is too short for the window
+    """
+    store = store or open_panel('data')
+    prices = store.prices.T
+    amounts = panel_strategy_amounts(prices, strategy)
+    returns = trailing_returns(prices, amounts, list(lookbacks.values()))
+    index = pd.Index(store.codes, name='fund_code')
+    return (pd.DataFrame(returns, index=index, columns=list(lookbacks)),
+            pd.DataFrame(rank_funds(returns), index=index, columns=list(lookbacks)))
+
+
+def generate_ranking_tables(results: Dict[str, Tuple[pd.DataFrame, pd.DataFrame]], output_path: str):
+    """Markdown table per strategy of return (rank) per fund and lookback, best long-term first"""
+    lines = ["# Fund Rankings\n",
+             "Profit rate of the buys within each lookback at the last net value, without stop-loss; "
+             "rank in parentheses.\n"]
+    for strategy_name, (returns, ranks) in results.items():
+        lookbacks = list(returns.columns)
+        lines += [
+            f"## {strategy_name}\n",
+            "| Fund Code | " + " | ".join(lookbacks) + " |",
+            "|" + "---|" * (len(lookbacks) + 1)
+        ]
+        order = ranks.sort_values(lookbacks[::-1], na_position='last').index
+        for fund in order:
+            cells = ["-" if np.isnan(returns.at[fund, lookback]) else
+                     f"{returns.at[fund, lookback]:.2f}% ({ranks.at[fund, lookback]:.0f})"
+                     for lookback in lookbacks]
+            lines.append(f"| {fund} | " + " | ".join(cells) + " |")
+        lines.append("")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+
+async def analyze_rankings(lookbacks: Dict[str, int] = LOOKBACKS):
+    """Rank all funds by every strategy's return over every lookback"""
+    store = open_panel('data')
+    print(f"Ranking {len(store.codes)} funds over {', '.join(lookbacks)}")
+
+    results = {}
+    for strategy_name, strategy in STRATEGIES.items():
+        returns, ranks = fund_rankings(strategy, lookbacks, store)
+        results[strategy_name] = (returns, ranks)
+
+        print(f"\n{strategy_name}:")
+        for lookback in lookbacks:
+            best = ranks[lookback].idxmin() if ranks[lookback].notna().any() else None
+            if best is not None:
+                print(f"{lookback} 最佳: {best} ({returns.at[best, lookback]:.2f}%)")
+
+    output_dir = 'results/comparison'
+    os.makedirs(output_dir, exist_ok=True)
+    generate_ranking_tables(results, os.path.join(output_dir, 'ranking.md'))
+    print("\nMarkdown table saved to 'results/comparison/ranking.md'")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(analyze_rankings())
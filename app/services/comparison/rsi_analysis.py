@@ -1,7 +1,12 @@
-import os
-import pandas as pd
-from typing import List, Dict, Callable
+from functools import partial
+import numpy as np
+from typing import List, Dict, Callable, Sequence, Tuple
 from app.models.strategy import FundData, Investment
+from app.models.features import FundFeatures, feature_cache
+from app.indicators import PriceHistory, rsi_at
+from app.data.loader import fund_prices
+from app.data.panel import read_fund
+from app.services.comparison.runner import run_funds
 from app.workers.draw import draw_strategy_comparison
 from app.workers.text import generate_markdown_table
 
@@ -19,25 +24,7 @@ def create_rsi_strategy(threshold: int) -> Callable:
         if date_index < period:
             return 0.0
 
-        # Calculate RSI
-        gains, losses = [], []
-        for i in range(date_index - period, date_index):
-            change = price_history[i+1] - price_history[i]
-            if change >= 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-
-        avg_gain = sum(gains) / period
-        avg_loss = sum(losses) / period
-
-        if avg_loss == 0:
-            return 0.0
-
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
+        rsi = rsi_at(price_history, date_index, period)
 
         # Invest based on threshold
         if rsi < threshold:
@@ -51,7 +38,8 @@ def calculate_investment(data: List[FundData], strategy_func: Callable) -> Inves
     """Calculate investment results based on given strategy"""
     inv = Investment()
     prev_value = None
-    price_history = [float(day['DWJZ']) for day in data]
+    # Owns the RSI stream of this run, so each day's RSI costs O(1)
+    price_history = PriceHistory(float(day['DWJZ']) for day in data)
 
     for idx, day_data in enumerate(data):
         current_value = float(day_data['DWJZ'])
@@ -61,68 +49,97 @@ def calculate_investment(data: List[FundData], strategy_func: Callable) -> Inves
             units = investment_amount / current_value
             inv.total_units += units
             inv.total_cost += investment_amount
-            inv.transactions.append((day_data['FSRQ'], units, investment_amount))
+            inv.transactions.append(day_data['FSRQ'], units, investment_amount)
 
         prev_value = current_value
 
     return inv
 
 
-async def analyze_rsi_thresholds():
-    """Analyze different RSI thresholds and compare their performance"""
-    fund_dir = 'data'
-    results = {}
+def sweep_rsi_thresholds(features: FundFeatures, thresholds: Sequence[float],
+                         periods: Sequence[int] = (14,),
+                         amount: float = 1000.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Evaluate the create_rsi_strategy backtest for every (period, threshold) pair at once
+
+    Each RSI series is computed once (and cached in features); thresholds
+    are an extra array axis compared against it.
+
+    Args:
+        features: Cached indicators of the fund
+        thresholds: RSI thresholds that trigger an investment
+        periods: RSI periods
+        amount: Investment per signal
+    Returns:
+        (total_cost, total_units), both shaped periods x thresholds
+    """
+    rsi = np.stack([features.rsi(period) for period in periods])
+    signals = rsi[:, None, :] < np.asarray(thresholds, dtype=np.float64)[None, :, None]
+    total_cost = signals.sum(axis=2) * amount
+    total_units = signals @ (amount / features.prices)
+    return total_cost, total_units
+
+
+def _threshold_names(thresholds: Sequence[float], periods: Sequence[int]) -> List[Tuple[str, str]]:
+    """(strategy name, printed label) per (period, threshold), period-major like the sweep"""
+    if len(periods) == 1:
+        return [("RSI_{}".format(threshold), str(threshold)) for threshold in thresholds]
+    return [("RSI{}_{}".format(period, threshold), "{} (period {})".format(threshold, period))
+            for period in periods for threshold in thresholds]
+
+
+def fund_rsi_thresholds(fund_code: str, file_path: str, thresholds: Sequence[float],
+                        periods: Sequence[int]) -> Dict[str, dict]:
+    """Results of every (period, threshold) pair on one fund, run by the fund runner"""
+    fund_data = read_fund(fund_code, file_path)
+    features = feature_cache.features(
+        fund_code, fund_prices(fund_data))
+    total_costs, total_units = sweep_rsi_thresholds(features, thresholds, periods)
+    final_price = features.prices[-1]
 
-    # Define RSI thresholds to test
-    thresholds = [20, 25, 30, 35, 40, 45, 50, 55, 60]
+    results = {}
+    names = _threshold_names(thresholds, periods)
+    for (strategy_name, _), total_cost, units in zip(names, total_costs.ravel(), total_units.ravel()):
+        total_cost = float(total_cost)
+        final_value = float(final_price * units)
+        profit = final_value - total_cost
+        profit_rate = (profit / total_cost) * 100 if total_cost > 0 else 0
+
+        results[strategy_name] = {
+            'total_cost': total_cost,
+            'total_units': float(units),
+            'final_value': final_value,
+            'profit': profit,
+            'profit_rate': profit_rate
+        }
+    return results
+
+
+async def analyze_rsi_thresholds(thresholds: Sequence[float] = (20, 25, 30, 35, 40, 45, 50, 55, 60),
+                                 periods: Sequence[int] = (14,), workers: int | None = None):
+    """Analyze different RSI thresholds and compare their performance
 
-    # Process each fund file
-    for file_name in os.listdir(fund_dir):
-        if not file_name.endswith('.csv'):
-            continue
+    Args:
+        thresholds: RSI thresholds to test, e.g. range(1, 100) for a dense sweep
+        periods: RSI periods to test; more than one gives a threshold x period grid
+        workers: Number of processes for the fund runner
+    """
+    fund_dir = 'data'
 
-        fund_code = file_name.split('.')[0]
-        file_path = os.path.join(fund_dir, file_name)
+    # Process each fund file in parallel
+    task = partial(fund_rsi_thresholds, thresholds=thresholds, periods=periods)
+    results, _ = run_funds(task, fund_dir, workers)
 
+    names = _threshold_names(thresholds, periods)
+    for fund_code, fund_results in results.items():
         print("Processing fund: {}".format(fund_code))
-
-        # Load fund data
-        df = pd.read_csv(file_path)
-        fund_data = []
-        for _, row in df.iterrows():
-            fund_data.append({
-                'FSRQ': row['FSRQ'],
-                'DWJZ': str(row['DWJZ']),
-                'JZZZL': str(row['JZZZL'])
-            })
-
-        results[fund_code] = {}
-
-        # Test each threshold
-        for threshold in thresholds:
-            strategy_name = "RSI_{}".format(threshold)
-            strategy_func = create_rsi_strategy(threshold)
-
-            investment = calculate_investment(fund_data, strategy_func)
-            final_value = float(fund_data[-1]['DWJZ']) * investment.total_units
-            profit = final_value - investment.total_cost
-            profit_rate = (profit / investment.total_cost) * 100 if investment.total_cost > 0 else 0
-
-            results[fund_code][strategy_name] = {
-                'total_cost': investment.total_cost,
-                'total_units': investment.total_units,
-                'final_value': final_value,
-                'profit': profit,
-                'profit_rate': profit_rate
-            }
-
-            print("\nRSI Threshold {}: ".format(threshold))
-            print("Total Investment: {:.2f}".format(investment.total_cost))
-            print("Profit Rate: {:.2f}%".format(profit_rate))
+        for strategy_name, label in names:
+            print("\nRSI Threshold {}: ".format(label))
+            print("Total Investment: {:.2f}".format(fund_results[strategy_name]['total_cost']))
+            print("Profit Rate: {:.2f}%".format(fund_results[strategy_name]['profit_rate']))
 
     # Save results
     draw_strategy_comparison(results, 'results/comparison/rsi_threshold_analysis.png')
     print("\nImage saved to 'results/comparison/rsi_threshold_analysis.png'")
 
     generate_markdown_table(results, 'results/comparison/rsi_threshold_analysis.md')
-    print("\nMarkdown table saved to 'results/comparison/rsi_threshold_analysis.md'")
\ No newline at end of file
+    print("\nMarkdown table saved to 'results/comparison/rsi_threshold_analysis.md'")
@@ -1,19 +1,28 @@
-from typing import List, Dict, TypedDict
+import traceback
+from typing import List, Dict, Tuple
 from app.models.strategy import FundData
-import pandas as pd
+from app import indicators
+from app.models.features import FundFeatures, feature_cache
+from app.models.ledger import Ledger, BUY, SELL
+from app.data.loader import fund_prices
+from app.data.panel import read_fund, open_panel
+from app.data.cache import open_cache, data_fingerprint, result_key
+from app.models.stateful import source_hash
+from app.services.comparison.runner import list_fund_files
+import numpy as np
 import matplotlib.pyplot as plt
-import os
 from pathlib import Path
 
 
-class TradeResult(TypedDict):
-    date: str          # Trade date
-    action: str        # 'BUY' or 'SELL'
-    units: float       # Number of units traded
-    price: float       # Price per unit
-    amount: float      # Total amount
-    remaining_cash: float  # Cash left after trade
-    total_value: float    # Portfolio value after trade
+# Portfolio trade ledger columns after the date; unlike ledger.TRADE_COLUMNS they carry cash and value
+PORTFOLIO_TRADE_COLUMNS = {
+    'action': np.int8,             # BUY or SELL
+    'units': np.float64,           # Number of units traded
+    'price': np.float64,           # Price per unit
+    'amount': np.float64,          # Total amount
+    'remaining_cash': np.float64,  # Cash left after trade
+    'total_value': np.float64,     # Portfolio value after trade
+}
 
 
 class Portfolio:
@@ -21,7 +30,7 @@ class Portfolio:
         self.initial_cash = initial_cash
         self.cash = initial_cash
         self.units = 0.0
-        self.trades: List[TradeResult] = []
+        self.trades = Ledger(PORTFOLIO_TRADE_COLUMNS)
 
     def can_buy(self, amount: float) -> bool:
         return self.cash >= amount
@@ -34,15 +43,8 @@ class Portfolio:
         self.units += units
         self.cash -= amount
 
-        self.trades.append({
-            'date': date,
-            'action': 'BUY',
-            'units': units,
-            'price': price,
-            'amount': amount,
-            'remaining_cash': self.cash,
-            'total_value': self.get_total_value(price)
-        })
+        self.trades.append(date, BUY, units, price, amount, self.cash,
+                           self.get_total_value(price))
 
     def sell(self, date: str, price: float, units: float) -> None:
         if units > self.units:
@@ -52,79 +54,36 @@ class Portfolio:
         self.units -= units
         self.cash += amount
 
-        self.trades.append({
-            'date': date,
-            'action': 'SELL',
-            'units': units,
-            'price': price,
-            'amount': amount,
-            'remaining_cash': self.cash,
-            'total_value': self.get_total_value(price)
-        })
+        self.trades.append(date, SELL, units, price, amount, self.cash,
+                           self.get_total_value(price))
 
     def get_total_value(self, current_price: float) -> float:
         return self.cash + (self.units * current_price)
 
 
-def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
-    """Calculate RSI values for the price series"""
-    rsi_values = []
+def calculate_rsi(prices: List[float], period: int = 14,
+                  features: FundFeatures | None = None) -> List[float]:
+    """Calculate Wilder RSI values for the price series, 50 until `period` changes are available
+
+    When the fund's cached features are given, the RSI series is taken from them.
+    """
     if len(prices) <= period:
         return [50.0] * len(prices)  # Default neutral RSI
 
-    # Calculate price changes
-    changes = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-
-    # Calculate initial averages
-    gains = []
-    losses = []
-
-    for change in changes[:period]:
-        if change > 0:
-            gains.append(change)
-            losses.append(0)
-        else:
-            gains.append(0)
-            losses.append(abs(change))
-
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
-
-    # Calculate RSI for the first period
-    if avg_loss == 0:
-        rsi = 100
+    if features is not None:
+        rsi_values = features.rsi(period, 'wilder').copy()
     else:
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-
-    rsi_values.extend([50.0] * period)  # Pad initial values
-    rsi_values.append(rsi)
+        rsi_values = indicators.rsi(np.asarray(prices, dtype=np.float64), period, method='wilder')
+    rsi_values[:period] = 50.0  # Pad initial values
+    return rsi_values.tolist()
 
-    # Calculate RSI for remaining periods
-    for i in range(period, len(changes)):
-        change = changes[i]
-        gain = change if change > 0 else 0
-        loss = abs(change) if change < 0 else 0
 
-        avg_gain = (avg_gain * (period - 1) + gain) / period
-        avg_loss = (avg_loss * (period - 1) + loss) / period
-
-        if avg_loss == 0:
-            rsi = 100
-        else:
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-
-        rsi_values.append(rsi)
-
-    return rsi_values
-
-
-def basic_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0) -> Portfolio:
+def basic_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0,
+                       rsi_values: List[float] | None = None) -> Portfolio:
     """Basic RSI strategy - only buy when RSI < 30"""
     portfolio = Portfolio(initial_cash)
-    prices = [float(day['DWJZ']) for day in data]
-    rsi_values = calculate_rsi(prices)
+    if rsi_values is None:
+        rsi_values = calculate_rsi([float(day['DWJZ']) for day in data])
 
     for idx, (day_data, rsi) in enumerate(zip(data, rsi_values)):
         price = float(day_data['DWJZ'])
@@ -138,11 +97,12 @@ def basic_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0) ->
     return portfolio
 
 
-def advanced_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0) -> Portfolio:
+def advanced_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0,
+                          rsi_values: List[float] | None = None) -> Portfolio:
     """Advanced RSI strategy with both buy and sell signals"""
     portfolio = Portfolio(initial_cash)
-    prices = [float(day['DWJZ']) for day in data]
-    rsi_values = calculate_rsi(prices)
+    if rsi_values is None:
+        rsi_values = calculate_rsi([float(day['DWJZ']) for day in data])
 
     for idx, (day_data, rsi) in enumerate(zip(data, rsi_values)):
         price = float(day_data['DWJZ'])
@@ -163,75 +123,224 @@ def advanced_rsi_strategy(data: List[FundData], initial_cash: float = 100000.0)
     return portfolio
 
 
-async def compare_rsi_strategies():
-    """Compare the two RSI strategies across all funds"""
-    fund_dir = 'data'
+def simulate_rsi_portfolios(prices: np.ndarray, rsi_values: np.ndarray,
+                            initial_cash: float = 100000.0, amount: float = 1000.0,
+                            buy_below: float = 40.0, sell_above: float | None = None,
+                            sell_fraction: float = 0.25) -> Dict[str, np.ndarray]:
+    """Portfolio runs of an RSI rule for many funds at once, without a trade ledger
+
+    Buys `amount` while RSI < buy_below and the cash covers it (can_buy),
+    otherwise sells sell_fraction of the units while RSI > sell_above, with
+    the same arithmetic as Portfolio.buy/sell, so results are identical to
+    basic_rsi_strategy (sell_above=None) and advanced_rsi_strategy
+    (sell_above=75). Only days with a signal in some fund are visited, each
+    as one vector step over all funds.
+
+    Args:
+        prices: funds x days net values, or one series; NaN where a fund has no data
+        rsi_values: RSI per fund and day, same shape as prices
+        initial_cash: Starting cash of every fund's portfolio
+        amount: Investment per buy signal
+        buy_below: RSI below which to buy
+        sell_above: RSI above which to sell, None to only buy
+        sell_fraction: Share of the units sold per sell signal
+    Returns:
+        One value per fund: 'cash', 'units', 'buys', 'sells', 'final_value'
+        at the last known price and 'return_rate' in percent
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    rsi_values = np.atleast_2d(np.asarray(rsi_values, dtype=np.float64))
+    known = ~np.isnan(prices)
+    buy_signal = known & (rsi_values < buy_below)
+    if sell_above is None:
+        sell_signal = np.zeros(prices.shape, dtype=bool)
+    else:
+        sell_signal = known & ~(rsi_values < buy_below) & (rsi_values > sell_above)
+
+    n_funds = len(prices)
+    cash = np.full(n_funds, float(initial_cash))
+    units = np.zeros(n_funds)
+    buys = np.zeros(n_funds, dtype=np.int64)
+    sells = np.zeros(n_funds, dtype=np.int64)
+    for day in np.flatnonzero((buy_signal | sell_signal).any(axis=0)):
+        price = prices[:, day]
+        buy = buy_signal[:, day] & (cash >= amount)
+        units[buy] += amount / price[buy]
+        cash[buy] -= amount
+        buys += buy
+
+        sell = sell_signal[:, day] & (units > 0)
+        sold = units[sell] * sell_fraction
+        units[sell] -= sold
+        cash[sell] += sold * price[sell]
+        sells += sell
+
+    last = prices.shape[1] - 1 - np.argmax(known[:, ::-1], axis=1)
+    final_value = cash + units * prices[np.arange(n_funds), last]
+    return {
+        'cash': cash,
+        'units': units,
+        'buys': buys,
+        'sells': sells,
+        'final_value': final_value,
+        'return_rate': (final_value - initial_cash) / initial_cash * 100,
+    }
+
+
+# RSI strategies compared by compare_rsi_strategies(), in report order, as
+# simulate_rsi_portfolios rules equivalent to basic/advanced_rsi_strategy
+RSI_STRATEGIES = {
+    'Basic RSI': {'buy_below': 40.0},
+    'Advanced RSI': {'buy_below': 40.0, 'sell_above': 75.0},
+}
+
+
+def rsi_rule_results(prices: np.ndarray, rsi_values: np.ndarray, names: List[str]) -> Dict[str, List[dict]]:
+    """Per-fund results of the named RSI_STRATEGIES over funds x days prices"""
     results = {}
-
+    for name in names:
+        run = simulate_rsi_portfolios(prices, rsi_values, **RSI_STRATEGIES[name])
+        results[name] = [{
+            'final_value': float(final_value),
+            'return_rate': float(return_rate),
+            'trades': int(trades)
+        } for final_value, return_rate, trades in zip(
+            run['final_value'], run['return_rate'], run['buys'] + run['sells'])]
+    return results
+
+
+# Version of the RSI code behind rsi_comparison_metrics results
+RSI_ENGINE_VERSION = source_hash(calculate_rsi, indicators)
+
+
+def _rsi_keys(fund_data: List[FundData]) -> List[str]:
+    """Result cache keys of every RSI_STRATEGIES rule on one fund"""
+    data_hash = data_fingerprint(fund_data)
+    return [result_key(data_hash, simulate_rsi_portfolios, engine=RSI_ENGINE_VERSION, **RSI_STRATEGIES[name])
+            for name in RSI_STRATEGIES]
+
+
+def rsi_comparison_metrics(fund_code: str, fund_data: List[FundData]) -> Dict[str, dict]:
+    """Results of both RSI strategies on already loaded fund data
+
+    Served from the result cache when neither the fund data nor the
+    simulation or RSI code changed since the last run.
+    """
+    names = list(RSI_STRATEGIES)
+
+    def compute(indices: List[int]) -> List[dict]:
+        # Both strategies share one Wilder RSI series per fund
+        prices = fund_prices(fund_data)
+        rsi_values = calculate_rsi(
+            prices, features=feature_cache.features(fund_code, prices))
+        results = rsi_rule_results(prices, rsi_values, [names[i] for i in indices])
+        return [results[names[i]][0] for i in indices]
+
+    cache = open_cache()
+    if cache is None:
+        return dict(zip(names, compute(list(range(len(names))))))
+    return dict(zip(names, cache.get_or_compute(_rsi_keys(fund_data), compute)))
+
+
+def rsi_comparison_batch(funds: List[Tuple[str, str]], period: int = 14) -> Tuple[Dict[str, Dict[str, dict]], Dict[str, str]]:
+    """rsi_comparison_metrics of many funds, simulated together
+
+    Funds are shifted to start on the same column and NaN padded at the
+    end, so one RSI call and one simulate_rsi_portfolios call per rule
+    cover all funds whose results are not cached.
+
+    Args:
+        funds: (fund_code, file_path) pairs
+        period: RSI period
+    Returns:
+        (results, failures) by fund code in the order given, as run_funds
+    """
+    cache = open_cache()
+    series, keys, failures = {}, {}, {}
+    for fund_code, file_path in funds:
+        try:
+            fund_data = read_fund(fund_code, file_path)
+            series[fund_code] = fund_prices(fund_data)
+            if cache is not None:
+                keys[fund_code] = _rsi_keys(fund_data)
+        except Exception:
+            failures[fund_code] = traceback.format_exc(limit=3)
+
+    names = list(RSI_STRATEGIES)
+    results: Dict[str, Dict[str, dict]] = {}
+    if cache is not None:
+        cached = cache.get_many([key for fund_keys in keys.values() for key in fund_keys])
+        for fund_code, fund_keys in keys.items():
+            if all(key in cached for key in fund_keys):
+                results[fund_code] = {name: cached[key] for name, key in zip(names, fund_keys)}
+
+    missing = [fund_code for fund_code in series if fund_code not in results]
+    if missing:
+        lengths = np.array([len(series[fund_code]) for fund_code in missing])
+        prices = np.full((len(missing), lengths.max()), np.nan)
+        for row, fund_code in enumerate(missing):
+            prices[row, :lengths[row]] = series[fund_code]
+        # As calculate_rsi: Wilder RSI on each fund's own days, 50 before it is defined
+        rsi_values = indicators.rsi(prices, period, method='wilder')
+        rsi_values[:, :period] = 50.0
+        rsi_values[lengths <= period] = 50.0
+
+        computed = rsi_rule_results(prices, rsi_values, names)
+        for row, fund_code in enumerate(missing):
+            results[fund_code] = {name: computed[name][row] for name in names}
+        if cache is not None:
+            cache.put_many((key, results[fund_code][name])
+                           for fund_code in missing for name, key in zip(names, keys[fund_code]))
+
+    ordered = {fund_code: results[fund_code] for fund_code, _ in funds if fund_code in results}
+    if failures:
+        print("{} of {} funds failed: {}".format(len(failures), len(funds), ", ".join(failures)))
+    return ordered, failures
+
+
+def fund_rsi_comparison(fund_code: str, file_path: str) -> Dict[str, dict]:
+    """Results of both RSI strategies on one fund, run by the fund runner"""
+    return rsi_comparison_metrics(fund_code, read_fund(fund_code, file_path))
+
+
+def report_rsi_comparison(results: Dict[str, Dict[str, dict]]) -> None:
+    """Print the per-fund RSI strategy results and save the chart and report"""
     # Create results directory if it doesn't exist
     output_dir = Path('results/rsi_comparison')
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for file_name in os.listdir(fund_dir):
-        if not file_name.endswith('.csv'):
-            continue
-
-        fund_code = file_name.split('.')[0]
-        file_path = os.path.join(fund_dir, file_name)
-
+    for fund_code, fund_results in results.items():
+        basic = fund_results['Basic RSI']
+        advanced = fund_results['Advanced RSI']
         print(f"\nAnalyzing fund: {fund_code}")
 
-        # Load fund data
-        df = pd.read_csv(file_path)
-        fund_data = [
-            {'FSRQ': row['FSRQ'], 'DWJZ': str(
-                row['DWJZ']), 'JZZZL': str(row['JZZZL'])}
-            for _, row in df.iterrows()
-        ]
-
-        # Run both strategies
-        basic_portfolio = basic_rsi_strategy(fund_data)
-        advanced_portfolio = advanced_rsi_strategy(fund_data)
-
-        # Calculate final results
-        final_price = float(fund_data[-1]['DWJZ'])
-
-        basic_final_value = basic_portfolio.get_total_value(final_price)
-        basic_return = ((basic_final_value - basic_portfolio.initial_cash) /
-                        basic_portfolio.initial_cash * 100)
-
-        advanced_final_value = advanced_portfolio.get_total_value(final_price)
-        advanced_return = ((advanced_final_value - advanced_portfolio.initial_cash) /
-                           advanced_portfolio.initial_cash * 100)
-
-        results[fund_code] = {
-            'Basic RSI': {
-                'final_value': basic_final_value,
-                'return_rate': basic_return,
-                'trades': len(basic_portfolio.trades)
-            },
-            'Advanced RSI': {
-                'final_value': advanced_final_value,
-                'return_rate': advanced_return,
-                'trades': len(advanced_portfolio.trades)
-            }
-        }
-
         print(f"\nBasic RSI Strategy:")
-        print(f"最终价值: {basic_final_value:.2f} 元")
-        print(f"收益率: {basic_return:.2f}%")
-        print(f"交易次数: {len(basic_portfolio.trades)}")
+        print(f"最终价值: {basic['final_value']:.2f} 元")
+        print(f"收益率: {basic['return_rate']:.2f}%")
+        print(f"交易次数: {basic['trades']}")
 
         print(f"\nAdvanced RSI Strategy:")
-        print(f"最终价值: {advanced_final_value:.2f} 元")
-        print(f"收益率: {advanced_return:.2f}%")
-        print(f"交易次数: {len(advanced_portfolio.trades)}")
+        print(f"最终价值: {advanced['final_value']:.2f} 元")
+        print(f"收益率: {advanced['return_rate']:.2f}%")
+        print(f"交易次数: {advanced['trades']}")
 
     # Generate visualization
     plot_strategy_comparison(results, output_dir / 'rsi_comparison.png')
     generate_markdown_report(results, output_dir / 'rsi_comparison.md')
 
 
+async def compare_rsi_strategies():
+    """Compare the two RSI strategies across all funds, simulated as one batch"""
+    fund_dir = 'data'
+
+    try:
+        open_panel(fund_dir)
+    except OSError as e:
+        print("Panel store unavailable, reading CSV files: {}".format(e))
+    results, _ = rsi_comparison_batch(list_fund_files(fund_dir))
+    report_rsi_comparison(results)
+
+
 def plot_strategy_comparison(results: dict, output_path: str):
     """Create visualization comparing the two strategies"""
     funds = list(results.keys())
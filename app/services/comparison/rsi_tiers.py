@@ -0,0 +1,89 @@
+import os
+from typing import Dict, Tuple
+import numpy as np
+
+from app.models.engine import ENHANCED_RSI_TIERS
+from app.models.features import feature_cache
+from app.models.optimize import evolve_tiers
+from app.data.loader import fund_prices
+from app.data.panel import read_fund
+from app.services.comparison.runner import default_workers, run_funds
+
+
+def fund_rsi_series(fund_code: str, file_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Net values and 14-day RSI of one fund, run by the fund runner"""
+    fund_data = read_fund(fund_code, file_path)
+    features = feature_cache.features(
+        fund_code, fund_prices(fund_data))
+    return features.prices, features.rsi(14)
+
+
+def format_tiers(cuts, amounts) -> str:
+    """'RSI<15: 8000, <=20: 4000, ...' as applied by tier_amounts"""
+    return ", ".join("RSI{}{:.0f}: {:.0f}".format('<' if i == 0 else '<=', cut, amount)
+                     for i, (cut, amount) in enumerate(zip(cuts, amounts)))
+
+
+def generate_tiers_report(result: Dict[str, object], fund_codes, output_path: str):
+    """Markdown summary of the search: best vs default tiers and the per-generation history"""
+    lines = [
+        "# Enhanced RSI Tier Search\n",
+        f"{len(result['train_funds'])} training funds, {len(result['holdout_funds'])} holdout funds, "
+        f"{result['evaluations']} tier sets evaluated.\n",
+        "## Mean Profit Rate (%)\n",
+        "| Tiers | Train | Holdout |",
+        "|---|---|---|",
+        f"| Default: {format_tiers(*ENHANCED_RSI_TIERS)} | "
+        f"{result['default_train']:.2f}% | {result['default_holdout']:.2f}% |",
+        f"| Best: {format_tiers(result['cuts'], result['amounts'])} | "
+        f"{result['train']:.2f}% | {result['holdout']:.2f}% |",
+        "",
+        "## Generations\n",
+        "| Generation | Best | Mean | Holdout of Best | Evaluated |",
+        "|---|---|---|---|---|",
+    ]
+    for row in result['history']:
+        lines.append(f"| {row['generation']} | {row['best']:.2f}% | {row['mean']:.2f}% | "
+                     f"{row['holdout']:.2f}% | {row['evaluations']} |")
+    lines += ["", "## Holdout Funds\n", ", ".join(fund_codes[i] for i in result['holdout_funds']), ""]
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+
+async def analyze_rsi_tiers(population: int = 48, generations: int = 100, patience: int = 10,
+                            holdout_fraction: float = 0.25, seed: int = 0, workers: int | None = None):
+    """Search the Enhanced RSI tiers with the best mean profit rate and check them on held-out funds
+
+    Args:
+        population: Candidates per generation
+        generations: Upper bound on generations
+        patience: Generations without improvement before stopping early
+        holdout_fraction: Share of funds kept out of the search
+        seed: Seed of the fund split and the search
+        workers: Number of processes for loading funds and evaluating candidates
+    """
+    fund_dir = 'data'
+    workers = workers or default_workers()
+
+    # RSI once per fund; every candidate reuses it
+    series, _ = run_funds(fund_rsi_series, fund_dir, workers)
+    fund_codes = list(series)
+    result = evolve_tiers(list(series.values()), population=population, generations=generations,
+                          patience=patience, holdout_fraction=holdout_fraction, seed=seed,
+                          workers=workers)
+
+    print(f"\n默认档位: {format_tiers(*ENHANCED_RSI_TIERS)}")
+    print(f"训练收益率 {result['default_train']:.2f}%, 验证收益率 {result['default_holdout']:.2f}%")
+    print(f"最佳档位: {format_tiers(result['cuts'], result['amounts'])}")
+    print(f"训练收益率 {result['train']:.2f}%, 验证收益率 {result['holdout']:.2f}%")
+
+    output_dir = 'results/comparison'
+    os.makedirs(output_dir, exist_ok=True)
+    generate_tiers_report(result, fund_codes, os.path.join(output_dir, 'rsi_tiers.md'))
+    print("\nMarkdown table saved to 'results/comparison/rsi_tiers.md'")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(analyze_rsi_tiers())
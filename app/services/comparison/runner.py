@@ -0,0 +1,79 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.data.panel import open_panel
+from app.data.cache import open_cache
+
+
+def default_workers() -> int:
+    """Worker count from the FUND_WORKERS environment variable, else the CPU count"""
+    return int(os.environ.get('FUND_WORKERS') or os.cpu_count() or 1)
+
+
+def list_fund_files(fund_dir: str = 'data') -> List[Tuple[str, str]]:
+    """(fund_code, file_path) for every CSV in fund_dir, in directory order"""
+    return [(file_name.split('.')[0], os.path.join(fund_dir, file_name))
+            for file_name in os.listdir(fund_dir) if file_name.endswith('.csv')]
+
+
+def _call(task: Callable, fund_code: str, file_path: str) -> Tuple[bool, Any]:
+    try:
+        return True, task(fund_code, file_path)
+    except Exception:
+        return False, traceback.format_exc(limit=3)
+
+
+def run_funds(task: Callable[[str, str], Any], fund_dir: str = 'data',
+              workers: int | None = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Run task(fund_code, file_path) for every fund CSV in a process pool
+
+    Args:
+        task: Module-level (picklable) function doing the CPU-bound work of one fund
+        fund_dir: Directory with one CSV per fund
+        workers: Number of processes, default_workers() if None; 1 runs in this process
+    Returns:
+        (results, failures): results by fund code in directory order regardless
+        of completion order, and the error of every fund that raised
+    """
+    funds = list_fund_files(fund_dir)
+    workers = workers or default_workers()
+    try:
+        # Workers then read the mmap panel instead of parsing every CSV
+        open_panel(fund_dir)
+    except OSError as e:
+        print("Panel store unavailable, reading CSV files: {}".format(e))
+    cache = open_cache()
+    before = cache.stats() if cache is not None else None
+    outcomes: Dict[str, Tuple[bool, Any]] = {}
+    started = time.time()
+
+    def report(fund_code: str, ok: bool, value: Any) -> None:
+        outcomes[fund_code] = (ok, value)
+        status = 'done' if ok else 'FAILED: {}'.format(value.strip().splitlines()[-1])
+        print("[{}/{}] {} {} ({:.1f}s)".format(
+            len(outcomes), len(funds), fund_code, status, time.time() - started))
+
+    if workers <= 1:
+        for fund_code, file_path in funds:
+            report(fund_code, *_call(task, fund_code, file_path))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_call, task, fund_code, file_path): fund_code
+                       for fund_code, file_path in funds}
+            for future in as_completed(futures):
+                report(futures[future], *future.result())
+
+    results = {code: outcomes[code][1] for code, _ in funds if outcomes[code][0]}
+    failures = {code: outcomes[code][1] for code, _ in funds if not outcomes[code][0]}
+    if failures:
+        print("{} of {} funds failed: {}".format(len(failures), len(funds), ", ".join(failures)))
+    if cache is not None:
+        after = cache.stats()
+        hits, misses = after['hits'] - before['hits'], after['misses'] - before['misses']
+        if hits or misses:
+            print("Result cache: {} hits, {} misses, {} entries ({:.1f} MB)".format(
+                hits, misses, after['entries'], after['bytes'] / 2**20))
+    return results, failures
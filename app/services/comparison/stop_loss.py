@@ -0,0 +1,76 @@
+import os
+from functools import partial
+from typing import Dict, Sequence
+import numpy as np
+
+from app.models.engine import strategy_amounts, sweep_stop_loss
+from app.models.features import feature_cache
+from app.data.loader import fund_prices
+from app.data.panel import read_fund
+from app.services.comparison.profit import STRATEGIES
+from app.services.comparison.runner import run_funds
+
+
+def fund_stop_loss(fund_code: str, file_path: str,
+                   thresholds: Sequence[float]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Every strategy under every stop-loss threshold on one fund, run by the fund runner
+
+    Returns:
+        sweep_stop_loss arrays by strategy name, each of length len(thresholds)
+    """
+    fund_data = read_fund(fund_code, file_path)
+    features = feature_cache.features(
+        fund_code, fund_prices(fund_data))
+    amounts = np.array([strategy_amounts(func, features) for func in STRATEGIES.values()])
+    sweep = sweep_stop_loss(features.prices, amounts, thresholds)
+    return {strategy_name: {metric: values[i] for metric, values in sweep.items()}
+            for i, strategy_name in enumerate(STRATEGIES)}
+
+
+def generate_stop_loss_table(results: dict, thresholds: Sequence[float], output_path: str):
+    """Markdown table of the average profit rate per strategy and threshold"""
+    strategies = list(next(iter(results.values())).keys())
+    lines = [
+        "# Stop-Loss Threshold Analysis\n",
+        "## Average Profit Rate by Strategy (%)\n",
+        "| Strategy | " + " | ".join(f"{threshold:.0%}" for threshold in thresholds) + " |",
+        "|" + "---|" * (len(thresholds) + 1)
+    ]
+    for strategy in strategies:
+        rates = np.mean([results[fund][strategy]['profit_rate'] for fund in results], axis=0)
+        lines.append(f"| {strategy} | " + " | ".join(f"{rate:.2f}%" for rate in rates) + " |")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+
+async def analyze_stop_loss(thresholds: Sequence[float] = (0.02, 0.04, 0.06, 0.08, 0.10, 0.15, 0.20),
+                            workers: int | None = None):
+    """Compare stop-loss thresholds for every strategy across all funds
+
+    Args:
+        thresholds: Stop-loss thresholds to test, 0.08 is the calculate_investment default
+        workers: Number of processes for the fund runner
+    """
+    fund_dir = 'data'
+
+    # Process each fund file in parallel, all thresholds in one kernel call per fund
+    task = partial(fund_stop_loss, thresholds=thresholds)
+    results, _ = run_funds(task, fund_dir, workers)
+
+    for fund_code, fund_results in results.items():
+        print(f"\nProcessing fund: {fund_code}")
+        for strategy_name, result in fund_results.items():
+            rates = ", ".join(f"{threshold:.0%}: {rate:.2f}%"
+                              for threshold, rate in zip(thresholds, result['profit_rate']))
+            print(f"{strategy_name} 收益率 {rates}")
+
+    output_dir = 'results/comparison'
+    os.makedirs(output_dir, exist_ok=True)
+    generate_stop_loss_table(results, thresholds, os.path.join(output_dir, 'stop_loss.md'))
+    print("\nMarkdown table saved to 'results/comparison/stop_loss.md'")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(analyze_stop_loss())
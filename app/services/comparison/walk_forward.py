@@ -0,0 +1,101 @@
+import os
+from functools import partial
+from typing import Dict, Sequence
+import numpy as np
+
+from app.models.engine import strategy_amounts, walk_forward_returns
+from app.models.features import feature_cache
+from app.data.loader import fund_prices
+from app.data.panel import read_fund
+from app.services.comparison.profit import STRATEGIES
+from app.services.comparison.runner import run_funds
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def return_distribution(returns: np.ndarray) -> Dict[str, float]:
+    """Summary of the returns of all start dates, NaN entries ignored"""
+    returns = returns[~np.isnan(returns)]
+    if not returns.size:
+        return {'starts': 0, 'mean': 0.0, 'win_rate': 0.0,
+                **{f"p{q}": 0.0 for q in PERCENTILES}}
+    percentiles = np.percentile(returns, PERCENTILES)
+    return {
+        'starts': int(returns.size),
+        'mean': float(returns.mean()),
+        'win_rate': float((returns > 0).mean() * 100),
+        **{f"p{q}": float(value) for q, value in zip(PERCENTILES, percentiles)}
+    }
+
+
+def fund_walk_forward(fund_code: str, file_path: str,
+                      holding_days: Sequence[int]) -> Dict[str, Dict[int, dict]]:
+    """Return distribution of every strategy and holding length on one fund, run by the fund runner"""
+    fund_data = read_fund(fund_code, file_path)
+    features = feature_cache.features(
+        fund_code, fund_prices(fund_data))
+    amounts = np.array([strategy_amounts(func, features) for func in STRATEGIES.values()])
+    returns = walk_forward_returns(features.prices, amounts, holding_days)
+    return {strategy_name: {days: return_distribution(returns[i, j])
+                            for j, days in enumerate(holding_days)}
+            for i, strategy_name in enumerate(STRATEGIES)}
+
+
+def generate_walk_forward_tables(results: dict, holding_days: Sequence[int], output_path: str):
+    """Markdown tables of median (p5 / p95) return per fund and strategy, one per holding length"""
+    strategies = list(next(iter(results.values())).keys())
+    lines = ["# Walk-Forward Analysis\n",
+             "Profit rate over all start dates: median (p5 / p95), without stop-loss.\n"]
+
+    for days in holding_days:
+        lines += [
+            f"## Holding {days} Trading Days\n",
+            "| Fund Code | " + " | ".join(strategies) + " |",
+            "|" + "---|" * (len(strategies) + 1)
+        ]
+        for fund, fund_results in results.items():
+            cells = [f"{r['p50']:.2f}% ({r['p5']:.2f}% / {r['p95']:.2f}%)"
+                     for r in (fund_results[strategy][days] for strategy in strategies)]
+            lines.append(f"| {fund} | " + " | ".join(cells) + " |")
+
+        averages = []
+        for strategy in strategies:
+            stats = [results[fund][strategy][days] for fund in results]
+            averages.append("{:.2f}% (win {:.1f}%)".format(
+                np.mean([s['p50'] for s in stats]), np.mean([s['win_rate'] for s in stats])))
+        lines.append("| Average | " + " | ".join(averages) + " |")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+
+async def analyze_walk_forward(holding_days: Sequence[int] = (20, 60, 120),
+                               workers: int | None = None):
+    """Return distributions over every start date, per fund and strategy
+
+    Args:
+        holding_days: Holding lengths in trading days
+        workers: Number of processes for the fund runner
+    """
+    fund_dir = 'data'
+
+    # Process each fund file in parallel
+    task = partial(fund_walk_forward, holding_days=holding_days)
+    results, _ = run_funds(task, fund_dir, workers)
+
+    for fund_code, fund_results in results.items():
+        print(f"\nProcessing fund: {fund_code}")
+        for strategy_name, by_days in fund_results.items():
+            summary = ", ".join(f"{days}d: {r['p50']:.2f}% ({r['win_rate']:.0f}% win)"
+                                for days, r in by_days.items())
+            print(f"{strategy_name} 收益率中位数 {summary}")
+
+    output_dir = 'results/comparison'
+    os.makedirs(output_dir, exist_ok=True)
+    generate_walk_forward_tables(results, holding_days, os.path.join(output_dir, 'walk_forward.md'))
+    print("\nMarkdown table saved to 'results/comparison/walk_forward.md'")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(analyze_walk_forward())
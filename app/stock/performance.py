@@ -2,12 +2,15 @@ from .config import BANKS
 from app.stock.traders import TraderFactory
 from app.stock.dataloader import KlineReader, Kline
 from app.stock.traders import Position
+from app.models.ledger import Ledger, BUY, SELL
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from textwrap import indent
 
 
 class Reporter(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     name: str
     code: str
     start_price: float
@@ -15,13 +18,29 @@ class Reporter(BaseModel):
     positions: list[Position]
     initial_cash: float
     final_total: float
+    trades: Ledger | None = None
 
     @property
     def return_rate(self) -> float:
         """Calculate return rate as percentage"""
         return (self.final_total / self.initial_cash - 1) * 100
 
+    @property
+    def trade_summary(self) -> dict:
+        """Fill counts and traded amounts from the trader's ledger"""
+        if self.trades is None:
+            return {'buys': 0, 'sells': 0, 'bought': 0.0, 'sold': 0.0}
+        side = self.trades['side']
+        amount = self.trades['price'] * self.trades['quantity']
+        return {
+            'buys': int((side == BUY).sum()),
+            'sells': int((side == SELL).sum()),
+            'bought': float(amount[side == BUY].sum()),
+            'sold': float(amount[side == SELL].sum()),
+        }
+
     def __str__(self):
+        summary = self.trade_summary
         text = (
             f'Stock: {self.name} ({self.code})\n'
             f'Price Movement:\n'
@@ -31,6 +50,9 @@ class Reporter(BaseModel):
             f'    Initial Cash: ¥{self.initial_cash:.2f}\n'
             f'    Final Total:  ¥{self.final_total:.2f}\n'
             f'    Return Rate:  {self.return_rate:+.2f}%\n'
+            f'Trades:\n'
+            f'    Buys: {summary["buys"]} (¥{summary["bought"]:.2f})\n'
+            f'    Sells: {summary["sells"]} (¥{summary["sold"]:.2f})\n'
             f'Positions:\n'
             f'    {self.positions}'
         )
@@ -69,6 +91,7 @@ def simulate(code, min_quantity, n_days=40, strategy='momentum'):
         'positions': trader.positions,
         'initial_cash': trader.initial_cash,
         'final_total': trader.total,
+        'trades': trader.trades,
     }
     reporter = Reporter(**info)
     return reporter
@@ -1,5 +1,7 @@
 from .dataloader import KlineReader
 from .dataloader import KlimeItem
+from app.indicators import SMA, Momentum, RollingRange
+from app.models.ledger import Ledger, TRADE_COLUMNS, BUY, SELL
 from pydantic import BaseModel, field_validator
 import codefast as cf
 import random
@@ -38,6 +40,11 @@ class BaseTrader:
         self.transaction_fee_sell = transaction_fee_sell
         self.current_price = 0
         self.trade_count = 0
+        self.trades = Ledger(TRADE_COLUMNS)  # Every fill, buys and sells
+
+    def record(self, date: str, side: int, price: float, quantity: float) -> None:
+        """Add a fill to the trade ledger"""
+        self.trades.append(date, side, price, quantity)
 
     def trade(self, item: KlimeItem):
         self.buy(item)
@@ -68,6 +75,9 @@ class MomentumTrader(BaseTrader):
         self.short_window = short_window
         self.long_window = long_window
         self.momentum_days = momentum_days
+        self.moving_averages = {window: SMA(window)
+                                for window in (short_window, long_window)}
+        self.momentum = Momentum(momentum_days)
         self.buy_threshold = buy_threshold
         self.sell_threshold = sell_threshold
         self.stop_loss = stop_loss
@@ -76,20 +86,18 @@ class MomentumTrader(BaseTrader):
 
     def calculate_ma(self, window: int) -> float:
         """Calculate moving average"""
-        if len(self.price_history) < window:
-            return 0.0
-        return sum(self.price_history[-window:]) / window
+        ma = self.moving_averages[window]
+        return ma.value if ma.ready else 0.0
 
     def calculate_momentum(self) -> float:
         """Calculate short-term momentum"""
-        if len(self.price_history) < self.momentum_days:
-            return 0.0
-        start_price = self.price_history[-self.momentum_days]
-        end_price = self.price_history[-1]
-        return (end_price - start_price) / start_price
+        return self.momentum.value if self.momentum.ready else 0.0
 
     def trade(self, item: KlimeItem):
         self.price_history.append(item.close)
+        for ma in self.moving_averages.values():
+            ma.update(item.close)
+        self.momentum.update(item.close)
 
         # Update T+1 sell restriction
         if self.positions and not self.can_sell:
@@ -146,6 +154,7 @@ class MomentumTrader(BaseTrader):
         self.cash -= item.close * self.min_quantity
         self.cash -= self.transaction_fee_buy
         self.current_price = item.close
+        self.record(item.date, BUY, item.close, self.min_quantity)
 
         cf.info("Buy at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
             item.close, item.date, self.cash, self.total))
@@ -172,6 +181,7 @@ class MomentumTrader(BaseTrader):
             self.current_price = item.close
             self.cash += item.close * position.quantity
             position.state = PositionState.SOLD
+            self.record(item.date, SELL, item.close, position.quantity)
             cf.info("Sell at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
                 item.close, item.date, self.cash, self.total))
         if any_deal:
@@ -264,6 +274,7 @@ class GridTrader(BaseTrader):
                         self.current_price = item.close
                         self.cash += self.current_price * position.quantity
                         position.state = PositionState.SOLD
+                        self.record(item.date, SELL, item.close, position.quantity)
                         cf.info("Stop Loss at {:.2f} {}, cash: {:.2f}, total: {:.2f}, loss: {:.2%}".format(
                             item.close, item.date, self.cash, self.total, self.stop_loss))
                     else:
@@ -296,6 +307,7 @@ class GridTrader(BaseTrader):
         self.cash -= item.close * self.min_quantity
         self.cash -= self.transaction_fee_buy
         self.current_price = item.close
+        self.record(item.date, BUY, item.close, self.min_quantity)
 
         cf.info("Buy at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
             item.close, item.date, self.cash, self.total))
@@ -322,6 +334,7 @@ class GridTrader(BaseTrader):
                 cf.info("Sell at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
                     item.close, item.date, cash, self.total))
                 self.cash += item.close * position.quantity
+                self.record(item.date, SELL, item.close, position.quantity)
             else:
                 remaining_positions.append(position)
 
@@ -353,6 +366,7 @@ class EnhancedGridTrader(BaseTrader):
         self.price_history = []
         self.volatility_window = volatility_window
         self.volatility_multiplier = volatility_multiplier
+        self.price_ranges = RollingRange(volatility_window, decay=0.94)
         self.last_close = None
         self.stop_loss_rate = stop_loss_rate
 
@@ -368,33 +382,11 @@ class EnhancedGridTrader(BaseTrader):
             - avg_down_range: average (open - low) / open
             - avg_up_range: average (high - open) / open
         """
-        if len(self.price_history) < self.volatility_window:
+        if not self.price_ranges.ready:
             return 0.01, 0.01  # Default 1% if not enough history
 
-        up_ranges = []
-        down_ranges = []
-
-        # Calculate recent price ranges relative to open
-        for i in range(-self.volatility_window, 0):
-            open_price = self.price_history[i]['open']
-            high_price = self.price_history[i]['high']
-            low_price = self.price_history[i]['low']
-
-            up_range = (high_price - open_price) / open_price
-            down_range = (open_price - low_price) / open_price
-
-            up_ranges.append(up_range)
-            down_ranges.append(down_range)
-
-        # Use exponential weights for more recent data
-        decay = 0.94
-        weights = [decay ** i for i in range(len(up_ranges))]
-        weights = [w / sum(weights) for w in weights]
-
-        avg_up_range = sum(r * w for r, w in zip(up_ranges, weights))
-        avg_down_range = sum(r * w for r, w in zip(down_ranges, weights))
-
-        return avg_down_range, avg_up_range
+        # Exponentially weighted over the last volatility_window days
+        return self.price_ranges.value
 
     def predict_price_range(self, open_price: float) -> tuple[float, float]:
         """
@@ -474,6 +466,7 @@ class EnhancedGridTrader(BaseTrader):
                 self.current_price = position.price * (1 + self.stop_loss_rate)
                 self.cash += self.current_price * position.quantity
                 position.state = PositionState.SOLD
+                self.record(item.date, SELL, self.current_price, position.quantity)
                 cf.info("Stop Loss at {:.2f} {}, cash: {:.2f}, total: {:.2f}, loss: {:.2%}".format(
                     self.current_price, item.date, self.cash, self.total,
                     self.stop_loss_rate))
@@ -513,6 +506,7 @@ class EnhancedGridTrader(BaseTrader):
                     self.current_price = target_sell_price
                     self.cash += target_sell_price * position.quantity
                     position.state = PositionState.SOLD
+                    self.record(item.date, SELL, target_sell_price, position.quantity)
                     cf.info("Sell at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
                         target_sell_price, item.date, self.cash, self.total))
                 else:
@@ -537,6 +531,7 @@ class EnhancedGridTrader(BaseTrader):
                 self.cash -= buy_order * quantity
                 self.cash -= self.transaction_fee_buy
                 self.current_price = buy_order
+                self.record(item.date, BUY, buy_order, quantity)
 
                 cf.info("Buy at {:.2f} {}, cash: {:.2f}, total: {:.2f}".format(
                     buy_order, item.date, self.cash, self.total))
@@ -550,6 +545,7 @@ class EnhancedGridTrader(BaseTrader):
             'close': item.close,
             'date': item.date
         })
+        self.price_ranges.update(item.open, item.high, item.low)
 
         if len(self.price_history) < 2:
             self.last_close = item.close
@@ -603,16 +599,6 @@ class Manager(EnhancedGridTrader):
         })
 
 
-reader = KlineReader('000001')
-kline = reader.read()
-data = kline.klines
-trader = Manager()
-for item in data:
-    trader.trade(item)
-
-trader.signal(11.8)
-
-
 class TraderFactory:
 
     @staticmethod
@@ -632,3 +618,14 @@ class TraderFactory:
             )
 
         return strategies[name](**kwargs)
+
+
+if __name__ == "__main__":
+    reader = KlineReader('000001')
+    kline = reader.read()
+    data = kline.klines
+    trader = Manager()
+    for item in data:
+        trader.trade(item)
+
+    trader.signal(11.8)
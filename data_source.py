@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
 from typing import List, TypedDict
 import httpx
-import pandas as pd
 import os
 
+from app.data.loader import read_fund_csv
+from app.data.panel import read_fund
+from app.data.ratelimit import eastmoney_limiter
+
 class FundData(TypedDict):
     FSRQ: str  # Date
     DWJZ: str  # Net Value
@@ -36,8 +39,9 @@ class APIDataSource(FundDataSource):
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         }
 
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, eastmoney_limiter.slot():
             response = await client.get(url, params=params, headers=headers)
+            response.raise_for_status()
             data = response.json()
             # Return from oldest to newest
             return list(reversed(data['Data']['LSJZList']))
@@ -45,17 +49,17 @@ class APIDataSource(FundDataSource):
 class CSVDataSource(FundDataSource):
     """Load fund data from CSV files"""
     async def get_fund_data(self, file_path: str) -> List[FundData]:
-        df = pd.read_csv(file_path)
-        fund_data: List[FundData] = []
+        # Typed columns, see app.data.loader.load_fund_series
+        return read_fund_csv(file_path)
 
-        for _, row in df.iterrows():
-            fund_data.append({
-                'FSRQ': row['FSRQ'],
-                'DWJZ': str(row['DWJZ']),
-                'JZZZL': str(row['JZZZL'])
-            })
+class PanelDataSource(FundDataSource):
+    """Load fund data from the memory-mapped panel store of a CSV directory"""
+    def __init__(self, fund_dir: str = 'data'):
+        self.fund_dir = fund_dir
 
-        return fund_data
+    async def get_fund_data(self, fund_code: str) -> List[FundData]:
+        # Falls back to the fund's CSV when the panel is older than the file
+        return read_fund(fund_code, os.path.join(self.fund_dir, f'{fund_code}.csv'))
 
 class DataSourceFactory:
     """Factory for creating data sources"""
@@ -65,5 +69,7 @@ class DataSourceFactory:
             return APIDataSource()
         elif source_type == "csv":
             return CSVDataSource()
+        elif source_type == "panel":
+            return PanelDataSource()
         else:
             raise ValueError(f"Unknown data source type: {source_type}")
\ No newline at end of file
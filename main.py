@@ -1,10 +1,9 @@
-from app.services.comparison.profit import profits
-from app.services.comparison.frequency import analyze_frequencies
+from app.services.comparison.pipeline import run_comparison
 from app.services.comparison.rsi_analysis import analyze_rsi_thresholds
 
 import asyncio
 
 if __name__ == "__main__":
     # asyncio.run(analyze_rsi_thresholds())
-    asyncio.run(profits())
-    asyncio.run(analyze_frequencies())
\ No newline at end of file
+    # Profit, frequency and RSI comparison reports from one pass over the funds
+    asyncio.run(run_comparison())
@@ -0,0 +1,62 @@
+"""Compare the old iterrows() CSV loading path with the typed loader
+
+Usage: python scripts/bench-loader.py [fund_dir] [repeat]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from app.data.loader import load_fund_series, read_fund_csv, fund_prices
+
+
+def iterrows_prices(file_path: str) -> np.ndarray:
+    """The loader the services used before: iterrows() to strings, then float() again"""
+    df = pd.read_csv(file_path)
+    fund_data = []
+    for _, row in df.iterrows():
+        fund_data.append({
+            'FSRQ': row['FSRQ'],
+            'DWJZ': str(row['DWJZ']),
+            'JZZZL': str(row['JZZZL'])
+        })
+    return np.array([float(day['DWJZ']) for day in fund_data])
+
+
+def bench(load, files: list, repeat: int) -> float:
+    """Best wall time of loading every file, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file_path in files:
+            load(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, elapsed: float, n_files: int, baseline: float) -> None:
+    print("{:<28} {:>8.1f} ms {:>7.3f} ms/file {:>6.1f}x".format(
+        name, elapsed * 1000, elapsed * 1000 / n_files, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    fund_dir = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    files = [os.path.join(fund_dir, f) for f in sorted(os.listdir(fund_dir)) if f.endswith('.csv')]
+    print(f"{len(files)} files, best of {repeat}")
+
+    baseline = bench(iterrows_prices, files, repeat)
+    report('iterrows + float()', baseline, len(files), baseline)
+    candidates = {
+        'load_fund_series (c)': lambda f: load_fund_series(f).prices,
+        'read_fund_csv view': lambda f: fund_prices(read_fund_csv(f)),
+    }
+    try:
+        import pyarrow  # noqa: F401
+        candidates['load_fund_series (pyarrow)'] = lambda f: load_fund_series(f, engine='pyarrow').prices
+    except ImportError:
+        print("pyarrow not installed, skipping the pyarrow engine")
+
+    for name, load in candidates.items():
+        report(name, bench(load, files, repeat), len(files), baseline)
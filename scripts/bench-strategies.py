@@ -0,0 +1,304 @@
+"""Benchmark suite of the strategy engines on synthetic data
+
+Times the per-day engine (calculate_investment), every strategy in its
+streaming (update) and batch form, calculate_rsi, TStrategy and
+DynamicTStrategy, every TraderFactory trader, and the multi-fund engine
+on generated random-walk series. Single-series cases run at every --bars
+size, panel cases at every --funds count with --panel-bars days each.
+
+A case stops growing once its next size is expected to take longer than
+--budget seconds; the skipped sizes are still listed in the output, so
+slow engines show up without stalling the suite.
+
+Results are written as JSON (results/bench/strategies-<time>.json by
+default). --compare prints the speed ratio against an earlier file and
+exits with status 1 when any case got slower than --tolerance.
+
+Usage: python scripts/bench-strategies.py [--bars 1000,10000,100000,1000000]
+           [--funds 10,100,1000,5000] [--only substring] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+
+from app.data.loader import FundSeries
+from app.models.strategy import (calculate_investment, fixed_drop_strategy, dynamic_drop_strategy,
+                                 periodic_strategy, ma_5_strategy, value_averaging_strategy,
+                                 rsi_strategy, enhanced_rsi_strategy)
+from app.models.stateful import as_strategy
+from app.models.features import FundFeatures
+from app.models.engine import VECTORIZED_STRATEGIES, calculate_investments, sweep_stop_loss
+from app.services.comparison.rsi_strategy import calculate_rsi
+
+STRATEGY_FUNCS = [fixed_drop_strategy, dynamic_drop_strategy, periodic_strategy, ma_5_strategy,
+                  value_averaging_strategy, rsi_strategy, enhanced_rsi_strategy]
+
+# TraderFactory names, aliases left out
+TRADERS = ['momentum', 'grid', 'enhanced_grid']
+
+# A case: (name, size axis 'bars' or 'funds', setup(size) -> function to time)
+Case = Tuple[str, str, Callable[[int], Callable[[], object]]]
+
+
+def synthetic_prices(n_bars: int, n_funds: int = 1, seed: int = 0) -> np.ndarray:
+    """Random-walk net values, funds x bars, rounded like real DWJZ
+
+    The log price is reflected into [-1, 1] so that even million-bar series
+    stay in a realistic 0.37-2.72 range; daily returns are unchanged
+    except on reflection days.
+    """
+    rng = np.random.default_rng(seed)
+    log_prices = np.cumsum(rng.normal(0.0002, 0.012, (n_funds, n_bars)), axis=1)
+    log_prices = np.abs((log_prices + 1) % 4 - 2) - 1
+    return np.round(np.exp(log_prices), 4)
+
+
+def synthetic_series(prices: np.ndarray) -> FundSeries:
+    """FundSeries of one price row on consecutive days from 2000-01-01"""
+    dates = np.datetime64('2000-01-01', 'D').astype(np.int64) + np.arange(len(prices))
+    changes = np.zeros(len(prices))
+    changes[1:] = np.round(np.diff(prices) / prices[:-1] * 100, 2)
+    return FundSeries(dates, prices, changes)
+
+
+def synthetic_klines(prices: np.ndarray) -> list:
+    """Daily KlimeItems with the closes in prices and a small intraday range"""
+    from app.stock.dataloader import KlimeItem
+
+    rng = np.random.default_rng(1)
+    series = synthetic_series(prices)
+    opens = np.r_[prices[0], prices[:-1]]
+    spread = np.abs(rng.normal(0, 0.008, len(prices))) * prices
+    highs = np.maximum(opens, prices) + spread
+    lows = np.minimum(opens, prices) - spread
+    return [KlimeItem(date=date, open=o, close=c, high=h, low=l, volume=100000, amount=c * 100000,
+                      amplitude=(h - l) / o * 100, change_percent=change,
+                      change_amount=c - o, turnover_rate=1.0)
+            for date, o, c, h, l, change in zip(series.date_strings.tolist(), opens.tolist(),
+                                                 prices.tolist(), highs.tolist(), lows.tolist(),
+                                                 series.changes.tolist())]
+
+
+def _records(n: int):
+    return synthetic_series(synthetic_prices(n)[0]).records()
+
+
+def _per_day_engine(func: Callable) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int):
+        data = _records(n)
+        return lambda: calculate_investment(data, as_strategy(func))
+    return setup
+
+
+def _update_loop(func: Callable) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int):
+        prices = synthetic_prices(n)[0].tolist()
+
+        def run():
+            strategy = as_strategy(func)
+            strategy.init()
+            return [strategy.update(price) for price in prices]
+        return run
+    return setup
+
+
+def _batch(func: Callable) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int):
+        prices = synthetic_prices(n)[0]
+        return lambda: VECTORIZED_STRATEGIES[func](FundFeatures(prices))
+    return setup
+
+
+def _calculate_rsi(n: int):
+    prices = synthetic_prices(n)[0].tolist()
+    return lambda: calculate_rsi(prices)
+
+
+def _t_strategy(cls_name: str) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int):
+        from app.fund import strategies
+        cls = getattr(strategies, cls_name)
+        data = list(_records(n))
+        return lambda: cls(data, initial_shares=10000, sell_holds=1000, threshold_rate=1.0).calculate()
+    return setup
+
+
+def _trader(name: str) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int):
+        from app.stock.traders import TraderFactory
+        klines = synthetic_klines(synthetic_prices(n)[0])
+
+        def run():
+            trader = TraderFactory.create_trader(name, cash=20000, min_quantity=100)
+            for item in klines:
+                trader.trade(item)
+            return trader.total
+        return run
+    return setup
+
+
+def single_series_cases() -> List[Case]:
+    """Cases over one fund of n bars"""
+    cases: List[Case] = []
+    for func in STRATEGY_FUNCS:
+        name = func.__name__.replace('_strategy', '')
+        cases.append(('calculate_investment/' + name, 'bars', _per_day_engine(func)))
+        cases.append(('update/' + name, 'bars', _update_loop(func)))
+        cases.append(('batch/' + name, 'bars', _batch(func)))
+    cases.append(('calculate_rsi', 'bars', _calculate_rsi))
+    cases.append(('TStrategy.calculate', 'bars', _t_strategy('TStrategy')))
+    cases.append(('DynamicTStrategy.calculate', 'bars', _t_strategy('DynamicTStrategy')))
+    cases.extend(('trader/' + name, 'bars', _trader(name)) for name in TRADERS)
+    return cases
+
+
+def panel_cases(panel_bars: int) -> List[Case]:
+    """Multi-fund cases over funds x panel_bars prices"""
+    strategies = [as_strategy(func) for func in STRATEGY_FUNCS]
+
+    def per_fund(n: int):
+        funds = [synthetic_series(prices).records() for prices in synthetic_prices(panel_bars, n)]
+        return lambda: [calculate_investments(data, strategies) for data in funds]
+
+    def panel(n: int):
+        prices = synthetic_prices(panel_bars, n)
+
+        def run():
+            features = FundFeatures(prices)
+            amounts = np.stack([VECTORIZED_STRATEGIES[func](features) for func in STRATEGY_FUNCS], axis=1)
+            return sweep_stop_loss(prices[:, None, :], amounts, [0.08])
+        return run
+
+    return [('calculate_investments/per_fund', 'funds', per_fund),
+            ('sweep_stop_loss/panel', 'funds', panel)]
+
+
+def time_call(func: Callable[[], object], repeat: int, budget: float) -> Tuple[float, int]:
+    """Best wall time of up to `repeat` calls, fewer when one call eats the budget"""
+    best, runs, spent = float('inf'), 0, 0.0
+    while runs < repeat and (runs == 0 or spent + best <= budget):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best, runs, spent = min(best, elapsed), runs + 1, spent + elapsed
+    return best, runs
+
+
+def run_case(case: Case, sizes: List[int], panel_bars: int, repeat: int, budget: float) -> List[dict]:
+    name, axis, setup = case
+    results = []
+    timings: List[Tuple[int, float]] = []
+    for size in sizes:
+        bars, funds = (size, 1) if axis == 'bars' else (panel_bars, size)
+        result = {'case': name, 'bars': bars, 'funds': funds}
+        estimate = _estimate(timings, size)
+        if estimate > budget:
+            result.update(status='skipped', note='estimated {:.0f}s over the {:.0f}s budget'.format(estimate, budget))
+        else:
+            try:
+                seconds, runs = time_call(setup(size), repeat, budget)
+                timings.append((size, seconds))
+                result.update(status='ok', seconds=seconds, runs=runs,
+                              ns_per_bar=seconds / (bars * funds) * 1e9)
+            except Exception as e:
+                result.update(status='error', note='{}: {}'.format(type(e).__name__, e))
+                print(traceback.format_exc(limit=2), file=sys.stderr)
+        results.append(result)
+        _print_result(result)
+        if result['status'] == 'error':
+            break
+    return results
+
+
+def _estimate(timings: List[Tuple[int, float]], size: int) -> float:
+    """Expected time at size, scaling the last timing by the growth seen so far (at least linear)"""
+    if not timings:
+        return 0.0
+    last_size, last_time = timings[-1]
+    exponent = 1.0
+    if len(timings) > 1:
+        prev_size, prev_time = timings[-2]
+        if prev_time > 0 and last_time > 0:
+            exponent = max(1.0, np.log(last_time / prev_time) / np.log(last_size / prev_size))
+    return last_time * (size / last_size) ** exponent
+
+
+def _print_result(result: dict) -> None:
+    label = "{:<36} {:>8} bars x {:>5} funds".format(result['case'], result['bars'], result['funds'])
+    if result['status'] == 'ok':
+        print("{} {:>11.3f} ms {:>10.1f} ns/bar".format(label, result['seconds'] * 1000, result['ns_per_bar']))
+    else:
+        print("{} {}: {}".format(label, result['status'], result['note']))
+
+
+def environment() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> int:
+    """Print new/old time ratios; returns the number of regressions"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['case'], r['bars'], r['funds']): r for r in json.load(f)['results']}
+    regressions = 0
+    print("\nCompared with {}".format(baseline_path))
+    for result in results:
+        old = baseline.get((result['case'], result['bars'], result['funds']))
+        if result['status'] != 'ok' or old is None or old['status'] != 'ok':
+            continue
+        ratio = result['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print("{:<36} {:>8} bars x {:>5} funds {:>6.2f}x time{}".format(
+            result['case'], result['bars'], result['funds'], ratio, flag))
+    return regressions
+
+
+def sizes(text: str) -> List[int]:
+    return [int(float(size)) for size in text.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bars', type=sizes, default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--funds', type=sizes, default=[10, 100, 1000, 5000])
+    parser.add_argument('--panel-bars', type=int, default=1000, help='days per fund in panel cases')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=20.0, help='seconds allowed per timed size')
+    parser.add_argument('--only', default='', help='run cases whose name contains this')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help='earlier result file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown flagged by --compare')
+    args = parser.parse_args()
+
+    results = []
+    for case in single_series_cases() + panel_cases(args.panel_bars):
+        if args.only in case[0]:
+            results.extend(run_case(case, args.bars if case[1] == 'bars' else args.funds,
+                                    args.panel_bars, args.repeat, args.budget))
+
+    output = args.output or os.path.join(
+        'results', 'bench', 'strategies-{}.json'.format(datetime.now().strftime('%Y%m%d-%H%M%S')))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({**environment(), 'args': {k: v for k, v in vars(args).items()}, 'results': results}, f, indent=2)
+    print("\nResults saved to '{}'".format(output))
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
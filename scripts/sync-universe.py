@@ -0,0 +1,36 @@
+"""Sync the history of every STRATEGY_CODES fund, resuming an interrupted run
+
+Usage: python scripts/sync-universe.py [--lmt 240] [--max-age 12] [--concurrency 16] [--manifest PATH]
+"""
+import argparse
+import asyncio
+import os
+
+from app.fund.configs import STRATEGY_CODES
+from app.data.fetch import history_store
+from app.data.sync import sync_universe, generate_sync_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lmt', type=int, default=240, help="days each fund should hold at least")
+    parser.add_argument('--max-age', type=float, default=12.0,
+                        help="hours after which a synced code is synced again; 0 syncs everything")
+    parser.add_argument('--concurrency', type=int, default=16, help="codes syncing at once")
+    parser.add_argument('--manifest', help="progress manifest, {history root}/manifest.json by default")
+    args = parser.parse_args()
+
+    results = asyncio.run(sync_universe(STRATEGY_CODES, lmt=args.lmt, max_age_hours=args.max_age,
+                                        concurrency=args.concurrency, manifest_path=args.manifest))
+
+    report_path = os.path.join(os.path.dirname(args.manifest or '') or history_store.root, 'sync-report.md')
+    generate_sync_report(results, report_path)
+    failed = [code for code, r in results.items() if r['status'] == 'failed']
+    print("\n{} codes: {} failed".format(len(results), len(failed)))
+    for code in failed:
+        print("{}: {}".format(code, results[code]['error']))
+    print("Report saved to '{}'".format(report_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,20 @@ from decimal import Decimal
 
 from app.fund.strategies import TStrategy, DynamicTStrategy
 from app.data.fetch import HistoryReader
+from app.data.sync import unique_codes
+from app.data.cache import open_cache, data_fingerprint, result_key
+
+
+def calculate_cached(data: list, *strategies: TStrategy | DynamicTStrategy) -> list:
+    """strategy.calculate() of each strategy, reusing results cached for the same data and settings"""
+    cache = open_cache()
+    if cache is None:
+        return [strategy.calculate() for strategy in strategies]
+    data_hash = data_fingerprint(data)
+    keys = [result_key(data_hash, type(strategy),
+                       **{name: value for name, value in vars(strategy).items() if name != 'data'})
+            for strategy in strategies]
+    return cache.get_or_compute(keys, lambda indices: [strategies[i].calculate() for i in indices])
 
 
 class Experiments:
@@ -93,7 +107,7 @@ class Experiments:
 
 class MultiExperiments:
     def __init__(self, codes: list[str]):
-        self.codes = codes
+        self.codes = unique_codes(codes)
 
     async def process_single_code(self, code: str):
         reader = HistoryReader(code, 100)
@@ -117,8 +131,8 @@ class MultiExperiments:
         )
 
         # Calculate results for both strategies
-        t_cost, t_shares, t_last_price = t_strategy.calculate()
-        dynamic_cost, dynamic_shares, dynamic_last_price = dynamic_strategy.calculate()
+        (t_cost, t_shares, t_last_price), (dynamic_cost, dynamic_shares, dynamic_last_price) = \
+            calculate_cached(data, t_strategy, dynamic_strategy)
 
         # Calculate metrics
         t_avg_cost = t_cost / t_shares if t_shares else Decimal('0')
@@ -143,14 +157,19 @@ class MultiExperiments:
 
     async def compare_strategies(self):
         results = []
+        failures = {}
         for code in self.codes:
             try:
                 print(f"Processing {code}...")
                 result = await self.process_single_code(code)
                 results.append(result)
             except Exception as e:
-                pass
+                failures[code] = '{}: {}'.format(type(e).__name__, e)
+                print(f"Failed {code}: {failures[code]}")
         results.sort(key=lambda x: x['default'])
+        if failures:
+            print(f"{len(failures)} of {len(self.codes)} codes failed, "
+                  "see scripts/sync-universe.py to fetch their history: " + ", ".join(failures))
 
         with open('/tmp/volativity.json', 'r') as f:
             volatility = json.load(f)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import date, timedelta
+
+import httpx
+
+from app.data.fetch import HistoryStore, write_json_atomic
+
+logging.disable(logging.INFO)
+
+
+class MockLsjz:
+    """lsjz endpoint serving a fund's days newest first; publish() adds newer days"""
+
+    def __init__(self, days: int) -> None:
+        self.first = date(2015, 1, 1)
+        self.days = days
+
+    def publish(self, days: int) -> None:
+        self.days += days
+
+    def dates(self):
+        return [(self.first + timedelta(i)).isoformat() for i in range(self.days)][::-1]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        index = int(request.url.params['pageIndex'])
+        size = int(request.url.params['pageSize'])
+        rows = [{'FSRQ': day, 'DWJZ': '1.0', 'JZZZL': '0.0'}
+                for day in self.dates()[(index - 1) * size:index * size]]
+        return httpx.Response(200, json={'Data': {'LSJZList': rows}})
+
+
+def read(store, endpoint, *args, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(endpoint.handler)) as client:
+            return await store.read(*args, client=client, **kwargs)
+    return asyncio.run(run())
+
+
+def assert_contiguous(days, endpoint):
+    dates = sorted(endpoint.dates())
+    start = dates.index(days[0]['FSRQ'])
+    assert [day['FSRQ'] for day in days] == dates[start:start + len(days)]
+
+
+def test_extend_stale_unsynced_store_leaves_no_hole(tmp_path):
+    endpoint = MockLsjz(400)
+    store = HistoryStore(str(tmp_path))
+    assert len(read(store, endpoint, 'X', 20)) == 20
+
+    endpoint.publish(300)
+    assert len(read(store, endpoint, 'X', 100)) == 100
+    days = read(store, endpoint, 'X', 250)
+    assert len(days) == 250
+    assert_contiguous(days, endpoint)
+
+    # The stored file has no hole either
+    stored = read(HistoryStore(str(tmp_path)), endpoint, 'X')
+    assert_contiguous(stored, endpoint)
+
+
+def test_read_returns_copies(tmp_path):
+    endpoint = MockLsjz(100)
+    store = HistoryStore(str(tmp_path))
+    read(store, endpoint, 'X', 20)[-1]['DWJZ'] = 'changed'
+    assert read(store, endpoint, 'X', 20)[-1]['DWJZ'] == '1.0'
+
+
+def test_extend_after_unsynced_growth_terminates(tmp_path):
+    endpoint = MockLsjz(400)
+    store = HistoryStore(str(tmp_path))
+    assert len(read(store, endpoint, 'X', 100)) == 100
+
+    # The stored run now sits on later pages than its length suggests
+    endpoint.publish(100)
+    requests = 0
+    handler = endpoint.handler
+
+    def counting(request):
+        nonlocal requests
+        requests += 1
+        assert requests < 50, "extend keeps refetching the same pages"
+        return handler(request)
+    endpoint.handler = counting
+
+    days = read(store, endpoint, 'X', 150)
+    assert len(days) == 150
+    assert_contiguous(days, endpoint)
+
+
+def test_write_json_atomic_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'X.json')
+    errors = []
+
+    def write(i):
+        try:
+            for _ in range(50):
+                write_json_atomic(path, {'writer': i, 'days': list(range(1000))})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert [p.name for p in tmp_path.iterdir()] == ['X.json']
+    with open(path) as f:
+        assert json.load(f)['writer'] in range(8)
@@ -0,0 +1,38 @@
+import sqlite3
+
+from app.data.cache import ResultCache
+
+
+def table(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute('SELECT COALESCE(SUM(size), 0), COUNT(*) FROM results').fetchone()
+    finally:
+        db.close()
+
+
+def test_running_size_follows_puts_replaces_and_evictions(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(path, max_bytes=10_000)
+    for i in range(100):
+        cache.put_many([('k{}'.format(i % 30), b'x' * (300 + 10 * i)), ('k{}'.format(i % 7), b'y' * 300)])
+        assert cache.size() == table(path)[0] <= 10_000
+    assert cache.stats()['evictions'] > 0
+
+    cache.clear()
+    assert cache.size() == 0
+    cache.put('a', 1)
+    assert cache.size() == table(path)[0]
+
+
+def test_reads_are_batched_until_flush(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(path)
+    cache.put('a', 1)
+    other = ResultCache(path)
+    assert cache.get_many(['a', 'b']) == {'a': 1}
+    assert other.stats()['hits'] == 0
+
+    cache.flush()
+    stats = other.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)